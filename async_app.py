@@ -0,0 +1,250 @@
+"""選用的 aiohttp 執行環境：/callback 與 /submit-form 以 coroutine 處理，LINE 回覆改走 AsyncLineBotApi
+
+同步的處理函式與資料庫存取在小型執行緒池（ASYNC_DB_THREADS）中執行，回覆先以 collect_replies() 收集，
+再回到 event loop 用非同步 client 送出，等待 LINE API 的期間不占用任何執行緒。
+其餘路由（匯出、管理 API、/metrics 等）原封不動交給 Flask app，在同一個執行緒池中執行。
+
+啟動方式（需安裝 aiohttp）：
+    python -m aiohttp.web -H 0.0.0.0 -P 8000 async_app:init_app
+"""
+import asyncio
+import contextlib
+import contextvars
+import io
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_to_bytes
+
+import aiohttp
+from aiohttp import web
+from linebot.exceptions import InvalidSignatureError, LineBotApiError
+
+import app as linebot_app
+from line_client import collect_replies, create_async_line_bot_api
+
+logger = logging.getLogger(__name__)
+
+# 執行處理函式與資料庫存取的執行緒數；SQLite 寫入本來就是一次一個，不需要太多
+ASYNC_DB_THREADS = int(os.getenv("ASYNC_DB_THREADS", "8"))
+
+EXECUTOR = web.AppKey("executor", ThreadPoolExecutor)
+LINE_API = web.AppKey("line_api", object)
+HTTP_SESSION = web.AppKey("http_session", aiohttp.ClientSession)
+USER_LOCKS = web.AppKey("user_locks", dict)
+
+# 不轉交給 aiohttp 的 hop-by-hop 標頭
+_HOP_HEADERS = {'connection', 'keep-alive', 'transfer-encoding'}
+
+
+def run_event(event):
+    """在執行緒池中處理單一事件，回傳 (收集到的回覆, 例外或 None)"""
+    with collect_replies() as replies:
+        try:
+            with linebot_app.app.app_context():
+                linebot_app.handle_event(event)
+        except Exception as e:
+            logger.exception(f"❌ 事件處理失敗：{e}")
+            return replies, e
+    return replies, None
+
+
+@contextlib.asynccontextmanager
+async def user_lock(app, user_id):
+    """同一位使用者一次只處理一批事件，LINE 把連續訊息拆成多個請求送來時也依到達順序處理
+
+    asyncio.Lock 依等待順序喚醒；沒有人在等的鎖隨即移除，不會隨使用者數成長。
+    """
+    if user_id is None:
+        yield
+        return
+    locks = app[USER_LOCKS]
+    entry = locks.setdefault(user_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del locks[user_id]
+
+
+async def handle_events(app, user_id, events):
+    """依序處理同一位使用者的事件；處理完一個事件就送出它的回覆，全部成功時回傳 True"""
+    loop = asyncio.get_running_loop()
+    ok = True
+    async with user_lock(app, user_id):
+        for event in events:
+            replies, error = await loop.run_in_executor(app[EXECUTOR], run_event, event)
+            ok = ok and error is None
+            for reply_token, messages in replies:
+                try:
+                    await app[LINE_API].reply_message(reply_token, messages)
+                except (LineBotApiError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    ok = False
+                    linebot_app.errors_total.inc("reply")
+                    logger.error(f"❌ 回覆失敗：{e}")
+    return ok
+
+
+async def callback(request):
+    with linebot_app.webhook_seconds.time():
+        signature = request.headers.get('X-Line-Signature', '')
+        body = await request.text()
+
+        try:
+            events = linebot_app.handler.parse(body, signature)
+        except InvalidSignatureError:
+            linebot_app.errors_total.inc("signature")
+            raise web.HTTPBadRequest()
+
+        # 不同使用者的事件同時處理；同一位使用者的事件保持順序，跨請求由 user_lock 排隊
+        by_user = {}
+        for event in events:
+            by_user.setdefault(getattr(event.source, 'user_id', None), []).append(event)
+        results = await asyncio.gather(*(
+            handle_events(request.app, user_id, user_events) for user_id, user_events in by_user.items()
+        ))
+        if not all(results):
+            raise web.HTTPInternalServerError()
+        return web.Response(text='OK')
+
+
+def run_in_context(func, *args):
+    with linebot_app.app.app_context():
+        return func(*args)
+
+
+async def submit_form(request):
+    """與 Flask 的 /submit-form 相同的 JSON／表單格式與回應"""
+    data = None
+    if request.content_type == 'application/json':
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+    if data is None:
+        data = dict(await request.post())
+    if linebot_app.is_batch_submission(data):
+        status = linebot_app.admin_denied(request.headers.get('Authorization', ''))
+        if status:
+            return web.Response(status=status)
+    body, status = await asyncio.get_running_loop().run_in_executor(
+        request.app[EXECUTOR], run_in_context, linebot_app.submit_estimates,
+        data, request.headers.get('Idempotency-Key', '')
+    )
+    return web.json_response(body, status=status)
+
+
+def wsgi_environ(request, body):
+    path = request.raw_path.split('?', 1)[0]
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': unquote_to_bytes(path).decode('latin-1'),
+        'QUERY_STRING': request.query_string,
+        'SERVER_NAME': request.url.host or '',
+        'SERVER_PORT': str(request.url.port or ''),
+        'SERVER_PROTOCOL': f"HTTP/{request.version.major}.{request.version.minor}",
+        'REMOTE_ADDR': request.remote or '',
+        'CONTENT_TYPE': request.headers.get('Content-Type', ''),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': request.scheme,
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in request.headers.items():
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+            continue
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def start_wsgi(environ):
+    """呼叫 Flask app 並取出第一段內容（start_response 可能延到這時才被呼叫）"""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = headers
+
+    iterable = linebot_app.app(environ, start_response)
+    iterator = iter(iterable)
+    first = next(iterator, None)
+    return started, iterable, iterator, first
+
+
+def close_wsgi(iterable):
+    close = getattr(iterable, 'close', None)
+    if close is not None:
+        close()
+
+
+async def flask_fallback(request):
+    """其餘路由交給 Flask app；串流回應（例如匯出）逐段在執行緒池中取出後送出
+
+    每段可能由不同執行緒取出，全部在同一個 contextvars.Context 中執行，Flask 的 request context 才跟得上。
+    """
+    loop = asyncio.get_running_loop()
+    executor = request.app[EXECUTOR]
+    context = contextvars.copy_context()
+    environ = wsgi_environ(request, await request.read())
+    started, iterable, iterator, chunk = await loop.run_in_executor(executor, context.run, start_wsgi, environ)
+    try:
+        response = web.StreamResponse(status=started['status'])
+        for name, value in started['headers']:
+            if name.lower() not in _HOP_HEADERS:
+                response.headers.add(name, value)
+        await response.prepare(request)
+        while chunk is not None:
+            if chunk:
+                await response.write(chunk)
+            chunk = await loop.run_in_executor(executor, context.run, next, iterator, None)
+        await response.write_eof()
+        return response
+    finally:
+        await loop.run_in_executor(executor, context.run, close_wsgi, iterable)
+
+
+async def on_startup(app):
+    linebot_app.initialize()
+    config = linebot_app.app.config
+    app[HTTP_SESSION] = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=config['LINE_API_POOL_SIZE']))
+    app[LINE_API] = create_async_line_bot_api(
+        config['CHANNEL_ACCESS_TOKEN'],
+        app[HTTP_SESSION],
+        endpoint=config['LINE_API_ENDPOINT'],
+        timeout=config['LINE_API_TIMEOUT'],
+        max_retries=config['LINE_API_MAX_RETRIES'],
+        max_concurrency=config['LINE_API_MAX_CONCURRENCY'],
+        observe=linebot_app.observe_line_api
+    )
+
+
+async def on_cleanup(app):
+    await app[HTTP_SESSION].close()
+    app[EXECUTOR].shutdown(wait=True)
+
+
+def init_app(argv=None):
+    """建立 aiohttp Application；python -m aiohttp.web 會以命令列參數呼叫"""
+    app = web.Application(client_max_size=linebot_app.app.config.get('MAX_CONTENT_LENGTH') or 1024 ** 2)
+    app[EXECUTOR] = ThreadPoolExecutor(max_workers=ASYNC_DB_THREADS, thread_name_prefix="async-db")
+    app[USER_LOCKS] = {}
+    app.router.add_post('/callback', callback)
+    app.router.add_post('/submit-form', submit_form)
+    app.router.add_route('*', '/{tail:.*}', flask_fallback)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(init_app(), host='0.0.0.0', port=int(os.getenv("PORT", "8000")))
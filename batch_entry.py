@@ -0,0 +1,73 @@
+import re
+import unicodedata
+
+from cart import MAX_QUANTITY
+
+# 一則訊息中各行的分隔：頓號、逗號、分號、換行（全形逗號與分號經 NFKC 後變成半形）
+SEPARATORS = re.compile(r'[、,;\n]+')
+# 行尾的數量與單位，例如「新增220V插座 3處」「斷路器x2」：數量前須有空白或 x／×，單位最多兩個字
+QUANTITY = re.compile(r'^(?P<name>.*?\S)(?:\s*[x×*]\s*|\s+)(?P<quantity>\d+)\s*(?P<unit>[^\d\s]{0,2})$')
+# 數量直接接在名稱後面（「插座2處」）時，後面必須是服務項目的單位，
+# 「220V」「5.5MM」這類名稱中的規格才不會被拆成數量
+ATTACHED_QUANTITY = re.compile(r'^(?P<name>.*?[^\d\s.])(?P<quantity>\d+)(?P<unit>[^\d\s]{1,2})$')
+# 一次最多處理的行數，超過的行原樣列給使用者重新傳送
+MAX_ENTRIES = 20
+
+
+def parse_entries(text, is_name=None, units=()):
+    """把一則訊息拆成 [{"text", "name", "quantity"}]；沒寫數量時 quantity 為 None
+
+    is_name(行) 為真時整行視為服務名稱，不拆出數量（名稱本身以數字加單位結尾的情況）。
+    units 為服務項目的單位，只有接在這些單位前面的數字可以直接連著名稱寫。
+    回傳所有行，不在這裡截斷；一次處理幾行由呼叫端依 MAX_ENTRIES 決定，並告知使用者沒處理到的行。
+    """
+    units = {unit.lower() for unit in units}
+    entries = []
+    for line in SEPARATORS.split(unicodedata.normalize('NFKC', text or '')):
+        line = line.strip()
+        if not line:
+            continue
+        match = None
+        if is_name is None or not is_name(line):
+            match = QUANTITY.match(line)
+            if match is None:
+                match = ATTACHED_QUANTITY.match(line)
+                if match is not None and match['unit'].lower() not in units:
+                    match = None
+        if match:
+            entries.append({"text": line, "name": match['name'].strip(), "quantity": int(match['quantity'])})
+        else:
+            entries.append({"text": line, "name": line, "quantity": None})
+    return entries
+
+
+def is_batch(entries):
+    """有多行或寫了數量時當成批次輸入，只有一個關鍵字時交給搜尋"""
+    return len(entries) > 1 or any(entry["quantity"] is not None for entry in entries)
+
+
+def resolve_entries(entries, catalog, candidates=4):
+    """依目錄對應每一行，回傳 (已確定的 [(行, 服務)], 需要確認的 [(行, 候選項目)], 找不到的 [行])
+
+    數量為 0 或超過 MAX_QUANTITY 的行視為找不到；沒寫數量時以 1 計。
+    """
+    resolved, ambiguous, missing = [], [], []
+    for entry in entries:
+        if entry["quantity"] is not None and not 0 < entry["quantity"] <= MAX_QUANTITY:
+            missing.append(entry)
+            continue
+        service, options = catalog.lookup(entry["name"], limit=candidates)
+        if service is not None:
+            resolved.append((entry, service))
+        elif options:
+            ambiguous.append((entry, options))
+        else:
+            missing.append(entry)
+    return resolved, ambiguous, missing
+
+
+def entry_text(name, entry):
+    """以服務名稱改寫一行，保留原本的數量與單位寫法；沒寫數量時補上 1，送回來時才會當成批次輸入"""
+    if entry["quantity"] is None:
+        return f"{name} 1"
+    return f"{name} {entry['text'][len(entry['name']):].strip()}"
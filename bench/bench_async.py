@@ -0,0 +1,75 @@
+"""同步（waitress 執行緒）與 async_app（aiohttp event loop）執行環境的吞吐量比較
+
+兩種執行環境各在新的程序中啟動（臨時 SQLite 資料庫、本機 LINE API stub），
+以 load_test 的完整估價對話施壓，LINE API 延遲越長、同時對話越多，執行緒模式越容易被回覆卡住。
+執行方式：python bench/bench_async.py [--users 100] [--concurrency 50] [--stub-latency 0.1] [--threads 8]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, os, sys, threading, uuid
+sys.path.insert(0, os.path.join(os.getcwd(), "bench"))
+from load_test import LineApiStub, percentile, run, start_local_app
+from catalog import ServiceCatalog
+
+runtime, secret, users, concurrency, latency, threads = sys.argv[1:7]
+stub = LineApiStub(latency=float(latency))
+threading.Thread(target=stub.serve_forever, daemon=True).start()
+url, close = start_local_app(stub.url, secret, int(threads), runtime)
+with open("services.json", encoding="utf-8") as f:
+    priced = [s for s in ServiceCatalog.from_data(json.load(f)).services if s.get("price_low") is not None]
+latencies, errors, duration = run(url, secret, int(users), int(concurrency), priced, uuid.uuid4().hex[:6])
+everything = [value for values in latencies.values() for value in values]
+print("RESULT " + json.dumps({
+    "events": len(everything),
+    "throughput": len(everything) / duration,
+    "p50_ms": percentile(everything, 50) * 1000,
+    "p95_ms": percentile(everything, 95) * 1000,
+    "p99_ms": percentile(everything, 99) * 1000,
+    "errors": sum(errors.values()),
+}))
+sys.stdout.flush()
+close()
+os._exit(0)
+'''
+
+
+def run_runtime(runtime, args):
+    env = dict(os.environ)
+    env.update({
+        "LOG_LEVEL": "WARNING",
+        # 兩邊都不讓 LINE API 的並行上限成為瓶頸
+        "LINE_API_MAX_CONCURRENCY": str(max(args.concurrency, 10)),
+        "LINE_API_POOL_SIZE": str(max(args.concurrency, 20)),
+    })
+    command = [sys.executable, "-c", CHILD, runtime, "bench-async-secret", str(args.users), str(args.concurrency),
+               str(args.stub_latency), str(args.threads)]
+    output = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    line = next(line for line in output.splitlines() if line.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--stub-latency", type=float, default=0.1)
+    parser.add_argument("--threads", type=int, default=8, help="waitress 的執行緒數")
+    args = parser.parse_args()
+
+    print(f"{args.users} 位使用者、同時 {args.concurrency} 個對話、LINE API 延遲 {args.stub_latency * 1000:.0f} ms")
+    print(f"{'執行環境':<10}{'事件':>7}{'events/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'錯誤':>6}")
+    for runtime in ("threaded", "async"):
+        r = run_runtime(runtime, args)
+        print(f"{runtime:<10}{r['events']:>7}{r['throughput']:>10.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+              f"{r['p99_ms']:>9.1f}{r['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""估價單 Flex Message 的產生成本：逐一建立 SDK 物件樹 vs. 預先編譯的樣板 vs. 快取（記憶體／磁碟層）
+
+同時檢查：項目少時兩者輸出的 JSON 完全相同；項目多時每個 bubble／carousel 都在 LINE 的大小上限內。
+執行方式：python bench/bench_flex.py [次數]
+使用暫存的 SQLite 與假的 LINE 設定，不會碰到正式資料庫或呼叫 LINE API。
+"""
+import json
+import os
+import sys
+import tempfile
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["RENDER_CACHE_DISK"] = "0"
+# 與 verify_db.py、load_test.py 相同：暫存資料庫、假的 LINE 設定，背景工作不執行
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='linebot-bench-'), 'bench.db')}"
+os.environ["CHANNEL_ACCESS_TOKEN"] = "bench-token"
+os.environ["CHANNEL_SECRET"] = "bench-secret"
+os.environ["LINE_API_ENDPOINT"] = "http://127.0.0.1:9"
+os.environ["WEBHOOK_DEDUPE_PERSIST"] = "0"
+os.environ["JANITOR_INTERVAL"] = "0"
+os.environ["CATALOG_POLL_INTERVAL"] = "0"
+os.environ["SESSION_FLUSH_INTERVAL"] = "0"
+os.environ["NOTIFY_INTERVAL"] = "0"
+
+from linebot.models import (  # noqa: E402
+    FlexSendMessage, BubbleContainer, BoxComponent, TextComponent,
+    ButtonComponent, SeparatorComponent, ImageComponent, PostbackAction
+)
+
+import app  # noqa: E402
+app.initialize()
+import flex_templates  # noqa: E402
+from cart import EstimateCart, is_quote_item  # noqa: E402
+from render_cache import RenderCache  # noqa: E402
+
+
+def legacy_flex_message(session, cart):
+    """改版前的寫法：每次都建立完整的 SDK 物件樹"""
+    items_components = []
+    for item in cart:
+        if is_quote_item(item):
+            item_text = f"▫️ {item['name']} ×{item['quantity']}{item['unit']}\n 💬 將由專人聯繫報價"
+        else:
+            item_text = (
+                f"▫️ {item['name']} ×{item['quantity']}{item['unit']}\n"
+                f" ➜ NT${item['total_low']:,} ~ NT${item['total_high']:,}"
+            )
+        if item.get('remark'):
+            item_text += f"\n  📌 {item['remark']}"
+        items_components.append(TextComponent(text=item_text, size="sm", wrap=True))
+
+    bubble = BubbleContainer(
+        body=BoxComponent(
+            layout="vertical",
+            contents=[
+                ImageComponent(url=flex_templates.LOGO_URL, size="md", aspect_mode="fit", aspect_ratio="1:1",
+                               align="center", gravity="center", margin="none"),
+                TextComponent(text="心感覺企業", size="sm", align="center", gravity="center",
+                              color="#888888", margin="xs"),
+                TextComponent(text="📥 心感覺估價單", weight="bold", size="xl", margin="md"),
+                SeparatorComponent(margin="md"),
+                TextComponent(text=f"👤 {session.name}", margin="md"),
+                TextComponent(text=f"📞 {session.phone}"),
+                TextComponent(text=f"📍 {session.address}", wrap=True),
+                TextComponent(text=f"📅 {session.visit_time}"),
+                SeparatorComponent(margin="md"),
+                TextComponent(text="🔧 項目明細：", weight="bold", margin="md"),
+                *items_components,
+                SeparatorComponent(margin="md"),
+                TextComponent(text=app.cart_totals_text(cart, "💰 總金額"), weight="bold", size="lg",
+                              margin="md", wrap=True)
+            ]
+        ),
+        footer=BoxComponent(
+            layout="vertical",
+            contents=[ButtonComponent(action=PostbackAction(label="✅ 我要預約", data="confirm_booking"),
+                                      style="primary")]
+        )
+    )
+    return FlexSendMessage(alt_text="估價單", contents=bubble)
+
+
+def make_cart(count):
+    catalog = app.catalog_loader.current
+    services = catalog.services
+    cart = EstimateCart([], catalog)
+    for i in range(count):
+        cart.add(services[i % len(services)], i % 9 + 1)
+    return cart
+
+
+def check(session, cart):
+    messages = app.create_estimate_flex_message(session, cart)
+    payloads = [message.as_json_dict() for message in messages]
+    if len(payloads) == 1 and payloads[0]['contents']['type'] == 'bubble':
+        legacy = legacy_flex_message(session, cart).as_json_dict()
+        assert json.dumps(payloads[0]) == json.dumps(legacy), "單一 bubble 的輸出與改版前不同"
+    bubbles = []
+    for payload in payloads:
+        contents = payload['contents']
+        if contents['type'] == 'carousel':
+            assert len(contents['contents']) <= flex_templates.CAROUSEL_MAX_BUBBLES
+            assert len(json.dumps(contents)) <= flex_templates.CAROUSEL_MAX_BYTES
+            bubbles.extend(contents['contents'])
+        else:
+            bubbles.append(contents)
+    assert all(len(json.dumps(bubble)) <= flex_templates.BUBBLE_MAX_BYTES for bubble in bubbles)
+    rendered = sum(1 for bubble in bubbles for c in bubble['body']['contents'] if c.get('size') == 'sm'
+                   and c['text'].startswith('▫️'))
+    assert rendered == len(cart), "項目數量不符"
+    return len(payloads), len(bubbles)
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    session = SimpleNamespace(name="王小明", phone="0912345678", address="台北市信義區市府路1號",
+                              visit_time="明天下午")
+    # 記憶體上限 0：每次都從磁碟層讀回，量測程序重啟或被 LRU 淘汰後的成本
+    disk_cache = RenderCache(max_bytes=0, path=tempfile.mkdtemp(prefix="linebot-render-"))
+    for count in (1, 20, 200):
+        cart = make_cart(count)
+        message_count, bubble_count = check(session, cart)
+        legacy_bytes = len(json.dumps(legacy_flex_message(session, cart).as_json_dict()))
+        runs = max(1, number // count)
+        results = {}
+        totals_text = app.cart_totals_text(cart, "💰 總金額")
+
+        def template():
+            messages = flex_templates.render_estimate(session.name, session.phone, session.address,
+                                                      session.visit_time, cart, totals_text)
+            return [m.as_json_dict() for m in messages]
+
+        key = app.estimate_render_key(app.session_fields(session), cart)
+        for label, func in (
+            ("legacy", lambda: legacy_flex_message(session, cart).as_json_dict()),
+            ("template", template),
+            # 快取命中時仍要算內容雜湊
+            ("cached", lambda: [m.as_json_dict() for m in app.create_estimate_flex_message(session, cart)]),
+            ("disk", lambda: disk_cache.get(app.estimate_render_key(app.session_fields(session), cart), 'flex',
+                                            template)),
+        ):
+            results[label] = min(timeit.repeat(func, number=runs, repeat=3)) / runs * 1e6
+        assert disk_cache.get(key, 'flex', template) == template()
+        print(f"{count:>4} 項: legacy {results['legacy']:9.1f} µs（單一 bubble {legacy_bytes:,} bytes）"
+              f" | template {results['template']:9.1f} µs（{message_count} 則訊息、{bubble_count} 個 bubble）"
+              f" | cached {results['cached']:8.1f} µs | disk {results['disk']:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""服務選單 Quick Reply 的產生成本：每次重建物件 vs. 依目錄版本快取
+
+執行方式：python bench/bench_quick_reply.py [次數]
+使用暫存的 SQLite 與假的 LINE 設定，不會碰到正式資料庫或呼叫 LINE API。
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 與 verify_db.py、load_test.py 相同：暫存資料庫、假的 LINE 設定，背景工作不執行
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='linebot-bench-'), 'bench.db')}"
+os.environ["CHANNEL_ACCESS_TOKEN"] = "bench-token"
+os.environ["CHANNEL_SECRET"] = "bench-secret"
+os.environ["LINE_API_ENDPOINT"] = "http://127.0.0.1:9"
+os.environ["RENDER_CACHE_DISK"] = "0"
+os.environ["WEBHOOK_DEDUPE_PERSIST"] = "0"
+os.environ["JANITOR_INTERVAL"] = "0"
+os.environ["CATALOG_POLL_INTERVAL"] = "0"
+os.environ["SESSION_FLUSH_INTERVAL"] = "0"
+os.environ["NOTIFY_INTERVAL"] = "0"
+
+import app  # noqa: E402
+app.initialize()
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    pages = range(1, app.catalog_loader.current.total_pages + 1)
+
+    # 送出前 LineBotApi 會呼叫 as_json_dict()，兩邊都算進成本
+    def rebuild():
+        for page in pages:
+            app.build_service_selection_message(page).as_json_dict()
+
+    def cached():
+        for page in pages:
+            app.create_service_selection_message(page).as_json_dict()
+
+    cached()
+    for label, func in (("rebuild", rebuild), ("cached", cached)):
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        per_call = seconds / (number * len(pages)) * 1e6
+        print(f"{label:>8}: {per_call:8.2f} µs / page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""服務關鍵字搜尋：建立索引的成本與單次查詢時間
+
+對照逐筆比對名稱與備註的子字串搜尋：項目少時兩者都在微秒等級，但子字串比對無法排序，
+也找不到「漏電斷路器」這類詞序不同的關鍵字。索引每個目錄版本只建立一次。
+執行方式：python bench/bench_search.py [次數]
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import ServiceSearchIndex, normalize  # noqa: E402
+
+QUERIES = ["插座", "斷路器", "燈", "220V插座", "熱水器", "馬桶", "疏通", "冷氣", "漏電斷路器"]
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with open('services.json', encoding='utf-8') as f:
+        data = json.load(f)
+    services = data['services'] if isinstance(data, dict) else data
+
+    build = min(timeit.repeat(lambda: ServiceSearchIndex(services), number=100, repeat=3)) / 100
+    print(f"建立索引（{len(services)} 個項目）：{build * 1000:.3f} ms")
+
+    index = ServiceSearchIndex(services)
+    texts = [normalize(s['name']) + ' ' + normalize(s.get('remark')) for s in services]
+
+    def scan():
+        for query in QUERIES:
+            q = normalize(query)
+            [s for s, text in zip(services, texts) if q in text]
+
+    def indexed():
+        for query in QUERIES:
+            index.search(query)
+
+    for query in QUERIES:
+        q = normalize(query)
+        found = sum(1 for text in texts if q in text)
+        print(f"  {query}：子字串 {found} 筆，索引 {len(index.search(query))} 筆")
+    for label, func in (("scan", scan), ("indexed", indexed)):
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        print(f"{label:>8}: {seconds / (number * len(QUERIES)) * 1e6:8.2f} µs / query")
+
+
+if __name__ == "__main__":
+    main()
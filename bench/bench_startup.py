@@ -0,0 +1,85 @@
+"""冷啟動時間：每輪開一個新的 Python 程序，量測 import app、初始化與第一個請求的耗時
+
+每輪使用新的臨時 SQLite 資料庫（含建表與遷移），第一個請求是一個簽章過的「我要估價」事件，
+LINE API 指向本機 stub；另外量測第二個請求作為對照。
+執行方式：python bench/bench_startup.py [輪數]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, os.path.join(os.getcwd(), "bench"))
+from load_test import LineApiStub, sign, webhook_body
+import threading
+stub = LineApiStub()
+threading.Thread(target=stub.serve_forever, daemon=True).start()
+os.environ["LINE_API_ENDPOINT"] = stub.url
+base = time.perf_counter()
+
+import app
+imported = time.perf_counter()
+if hasattr(app, "create_app"):
+    flask_app = app.create_app()
+else:
+    flask_app = app.app
+created = time.perf_counter()
+client = flask_app.test_client()
+
+def request(text):
+    body = webhook_body("Ustartup", "message", text)
+    response = client.post("/callback", data=body.encode("utf-8"), headers={
+        "Content-Type": "application/json", "X-Line-Signature": sign(os.environ["CHANNEL_SECRET"], body)})
+    assert response.status_code == 200, response.status_code
+
+request("我要估價")
+first = time.perf_counter()
+request("我要估價")
+second = time.perf_counter()
+print("RESULT " + json.dumps({
+    "import_ms": (imported - base) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (first - created) * 1000,
+    "second_request_ms": (second - first) * 1000,
+    "total_ms": (first - base) * 1000,
+}))
+sys.stdout.flush()
+os._exit(0)
+'''
+
+
+def run_once():
+    workdir = tempfile.mkdtemp(prefix="linebot-startup-")
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        "CHANNEL_SECRET": "startup-secret",
+        "CHANNEL_ACCESS_TOKEN": "startup-token",
+        "WEBHOOK_DEDUPE_PERSIST": "0",
+        "RENDER_CACHE_DISK": "0",
+        "JANITOR_INTERVAL": "0",
+        "LOG_LEVEL": "WARNING",
+    })
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    line = next(line for line in output.splitlines() if line.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [run_once() for _ in range(rounds)]
+    for key in results[0]:
+        values = [result[key] for result in results]
+        print(f"{key:>18}: 中位數 {statistics.median(values):8.1f} ms（最小 {min(values):.1f}、最大 {max(values):.1f}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Webhook 壓力測試：模擬多位使用者同時走完整個估價對話
+
+每位使用者依序送出「我要估價 → 翻頁 → 搜尋 → 一次輸入多個項目 → 選服務 → 輸入數量 → 完成選擇 → 確認估價 → 聯絡資料 → 勘場時間 → 我要預約」，
+事件以測試用 channel secret 簽章後 POST 到 /callback；LINE API 指向本機 stub，stub 記錄呼叫並可加入延遲與錯誤。
+結果依事件類型（路由名稱）列出 p50/p95/p99 延遲、吞吐量，以及伺服器端 /webhook-stats 回報的平均資料庫耗時。
+
+執行方式：
+    python bench/load_test.py --users 200 --concurrency 20 --stub-latency 0.05 --stub-error-rate 0.01
+
+預設在同一個程序內以 waitress 啟動 app（臨時 SQLite 資料庫，不會動到 instance/）；
+--runtime async 改用 async_app 的 aiohttp 執行環境（需安裝 aiohttp）。
+要測已啟動的伺服器時加上 --url，並讓伺服器以 LINE_API_ENDPOINT 指向這裡印出的 stub 位址、
+CHANNEL_SECRET 與 --secret 相同。ASYNC_WEBHOOK=1 時 /callback 只負責排入佇列，延遲不含處理時間。
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+DEFAULT_SECRET = "loadtest-channel-secret"
+
+
+class LineApiStub(ThreadingHTTPServer):
+    """假的 LINE Messaging API：每個請求等待 latency（加上 0 ~ jitter 秒），以 error_rate 的機率回傳 error_status"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=500):
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.calls = Counter()
+        self.statuses = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def record(self, method, path, status):
+        # /v2/bot/profile/{userId} 之類的路徑只保留前四段，方便彙總
+        key = f"{method} {'/'.join(path.split('?')[0].split('/')[:5])}"
+        with self._lock:
+            self.calls[key] += 1
+            self.statuses[status] += 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 標頭與內容分兩次寫出，不關 Nagle 會和 client 的 delayed ACK 卡住約 40ms
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        stub = self.server
+        delay = stub.latency + random.uniform(0, stub.jitter)
+        if delay:
+            time.sleep(delay)
+        if random.random() < stub.error_rate:
+            status, body = stub.error_status, {"message": "injected error"}
+        elif self.path.startswith('/v2/bot/profile/'):
+            status, body = 200, {"userId": self.path.rsplit('/', 1)[-1], "displayName": "壓測使用者"}
+        else:
+            status, body = 200, {}
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        stub.record(self.command, self.path, status)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+def sign(secret, body):
+    return base64.b64encode(hmac.new(secret.encode('utf-8'), body.encode('utf-8'), hashlib.sha256).digest()).decode()
+
+
+def webhook_body(user_id, kind, value):
+    event = {
+        "type": kind,
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": {"type": "user", "userId": user_id},
+        "webhookEventId": uuid.uuid4().hex,
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": uuid.uuid4().hex,
+    }
+    if kind == "message":
+        event["message"] = {"id": uuid.uuid4().hex[:16], "type": "text", "text": value}
+    else:
+        event["postback"] = {"data": value}
+    return json.dumps({"destination": "Uloadtest", "events": [event]}, ensure_ascii=False)
+
+
+def conversation(priced_services):
+    """一位使用者的完整估價對話：(事件類型, 種類, 內容)；事件類型與伺服器端的路由名稱相同"""
+    first, second = random.sample(priced_services, 2)
+    return [
+        ("start_estimate", "message", "我要估價"),
+        ("turn_page", "postback", "next_page:2"),
+        ("turn_page", "postback", "prev_page:1"),
+        ("input_services", "message", "插座"),
+        ("input_services", "message", "新增220V插座 2處、斷路器 1組"),
+        ("select_service", "postback", f"select_service:{first['id']}"),
+        ("input_quantity", "message", str(random.randint(1, 9))),
+        ("select_service", "postback", f"select_service:{second['id']}"),
+        ("input_quantity", "message", str(random.randint(1, 9))),
+        ("finish_selection", "postback", "finish_selection"),
+        ("confirm_estimate", "postback", "confirm_estimate"),
+        ("input_contact", "message", "壓測使用者"),
+        ("input_contact", "message", "0912345678"),
+        ("input_contact", "message", "台北市信義區市府路1號"),
+        ("input_visit_time", "message", "明天下午"),
+        ("confirm_booking", "postback", "confirm_booking"),
+    ]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def route_db_totals(url):
+    """/webhook-stats 中每個路由累計的 (次數, 資料庫秒數)"""
+    try:
+        routes = requests.get(f"{url}/webhook-stats", timeout=10).json().get("routes", {})
+    except (requests.RequestException, ValueError):
+        return {}
+    return {name: (s["count"], s["count"] * s.get("db_avg_ms", 0) / 1000) for name, s in routes.items()}
+
+
+def run(url, secret, users, concurrency, priced_services, run_id):
+    latencies = defaultdict(list)
+    errors = Counter()
+    lock = threading.Lock()
+
+    def simulate(index):
+        http = requests.Session()
+        user_id = f"Uload{run_id}{index:06d}"
+        for event_type, kind, value in conversation(priced_services):
+            body = webhook_body(user_id, kind, value)
+            started = time.perf_counter()
+            try:
+                response = http.post(f"{url}/callback", data=body.encode('utf-8'), timeout=30, headers={
+                    "Content-Type": "application/json",
+                    "X-Line-Signature": sign(secret, body),
+                })
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[event_type].append(elapsed)
+                if not ok:
+                    errors[event_type] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(simulate, range(users)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def report(latencies, errors, duration, db_before, db_after, stub):
+    total = sum(len(v) for v in latencies.values())
+    print(f"\n事件 {total} 筆，耗時 {duration:.2f} 秒，吞吐量 {total / duration:.1f} events/s")
+    print(f"{'事件類型':<18}{'次數':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'錯誤':>6}{'DB ms':>9}")
+    everything = []
+    for event_type, values in latencies.items():
+        everything.extend(values)
+        count, db_seconds = db_after.get(event_type, (0, 0.0))
+        before_count, before_seconds = db_before.get(event_type, (0, 0.0))
+        db_ms = (db_seconds - before_seconds) / (count - before_count) * 1000 if count > before_count else None
+        print(f"{event_type:<18}{len(values):>7}"
+              + "".join(f"{percentile(values, p) * 1000:>9.1f}" for p in (50, 95, 99))
+              + f"{max(values) * 1000:>9.1f}{errors[event_type]:>6}"
+              + (f"{db_ms:>9.2f}" if db_ms is not None else f"{'-':>9}"))
+    print(f"{'全部':<18}{len(everything):>7}"
+          + "".join(f"{percentile(everything, p) * 1000:>9.1f}" for p in (50, 95, 99))
+          + f"{max(everything) * 1000:>9.1f}{sum(errors.values()):>6}")
+    print(f"\nLINE API stub：{dict(stub.calls)}，狀態碼 {dict(stub.statuses)}")
+
+
+def start_local_app(stub_url, secret, threads, runtime="threaded"):
+    """在本程序啟動 app（waitress 或 aiohttp），使用臨時資料庫並關閉背景整理；回傳 (網址, 關閉用的函式)"""
+    workdir = tempfile.mkdtemp(prefix="linebot-loadtest-")
+    os.environ["CHANNEL_SECRET"] = secret
+    os.environ.setdefault("CHANNEL_ACCESS_TOKEN", "loadtest-token")
+    os.environ["LINE_API_ENDPOINT"] = stub_url
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'loadtest.db')}")
+    os.environ["WEBHOOK_DEDUPE_PERSIST"] = "0"
+    os.environ["RENDER_CACHE_DISK"] = "0"
+    os.environ["JANITOR_INTERVAL"] = "0"
+
+    if runtime == "async":
+        return start_async_app()
+
+    from waitress import create_server
+    import app as linebot_app
+
+    server = create_server(linebot_app.app, host='127.0.0.1', port=0, threads=threads)
+    threading.Thread(target=server.run, name="waitress", daemon=True).start()
+    return f"http://127.0.0.1:{server.effective_port}", server.close
+
+
+def start_async_app():
+    import asyncio
+    from aiohttp import web
+    import async_app
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(async_app.init_app(), access_log=None)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    loop.run_until_complete(site.start())
+    host, port = runner.addresses[0][:2]
+    threading.Thread(target=loop.run_forever, name="aiohttp", daemon=True).start()
+
+    def close():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(timeout=10)
+        loop.call_soon_threadsafe(loop.stop)
+    return f"http://{host}:{port}", close
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=100, help="模擬的使用者（對話）數")
+    parser.add_argument("--concurrency", type=int, default=10, help="同時進行的對話數")
+    parser.add_argument("--url", help="已啟動的伺服器，例如 http://127.0.0.1:5000；未指定時在本程序啟動")
+    parser.add_argument("--secret", default=os.getenv("LOADTEST_CHANNEL_SECRET", DEFAULT_SECRET))
+    parser.add_argument("--threads", type=int, default=8, help="本程序啟動時 waitress 的執行緒數")
+    parser.add_argument("--runtime", choices=("threaded", "async"), default="threaded",
+                        help="本程序啟動時使用 waitress（threaded）或 async_app（async）")
+    parser.add_argument("--stub-port", type=int, default=0)
+    parser.add_argument("--stub-latency", type=float, default=0.02, help="LINE API 每次呼叫的延遲秒數")
+    parser.add_argument("--stub-jitter", type=float, default=0.01)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0, help="LINE API 回傳錯誤的比例")
+    parser.add_argument("--stub-error-status", type=int, default=500)
+    args = parser.parse_args()
+
+    stub = LineApiStub(args.stub_port, args.stub_latency, args.stub_jitter, args.stub_error_rate, args.stub_error_status)
+    threading.Thread(target=stub.serve_forever, name="line-stub", daemon=True).start()
+    print(f"🧪 LINE API stub：{stub.url}")
+
+    close = None
+    url = args.url
+    if url:
+        url = url.rstrip('/')
+    else:
+        url, close = start_local_app(stub.url, args.secret, args.threads, args.runtime)
+    print(f"🎯 目標：{url}/callback，{args.users} 位使用者、同時 {args.concurrency} 個對話")
+
+    from catalog import ServiceCatalog
+    with open('services.json', encoding='utf-8') as f:
+        catalog = ServiceCatalog.from_data(json.load(f))
+    priced_services = [s for s in catalog.services if s.get('price_low') is not None]
+
+    db_before = route_db_totals(url)
+    latencies, errors, duration = run(url, args.secret, args.users, args.concurrency, priced_services,
+                                      uuid.uuid4().hex[:6])
+    db_after = route_db_totals(url)
+    report(latencies, errors, duration, db_before, db_after, stub)
+
+    stub.shutdown()
+    if close is not None:
+        close()
+
+
+if __name__ == "__main__":
+    main()
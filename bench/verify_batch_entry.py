@@ -0,0 +1,69 @@
+"""確認一則訊息中的項目與數量拆解正確：規格中的數字（220V、5.5MM）不會被當成數量，超過 MAX_ENTRIES 的行也不會被丟掉
+
+執行方式：python bench/verify_batch_entry.py
+以目前的 services.json 檢查，不需要資料庫或 LINE 設定。
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from batch_entry import MAX_ENTRIES, entry_text, is_batch, parse_entries, resolve_entries  # noqa: E402
+from catalog import ServiceCatalog  # noqa: E402
+
+# (輸入, 預期的 [(名稱, 數量)])；數量 None 代表沒寫數量
+PARSE_CASES = [
+    ("220V", [("220V", None)]),
+    ("110v", [("110v", None)]),
+    ("5.5MM", [("5.5MM", None)]),
+    ("２２０Ｖ", [("220V", None)]),
+    ("新增220V插座 3處", [("新增220V插座", 3)]),
+    ("斷路器x2", [("斷路器", 2)]),
+    ("斷路器 × 2組", [("斷路器", 2)]),
+    ("插座2處", [("插座", 2)]),
+    ("插座 2", [("插座", 2)]),
+    ("新增220V插座 2處、斷路器 1組", [("新增220V插座", 2), ("斷路器", 1)]),
+]
+# 只有一個關鍵字、沒寫數量的輸入要走搜尋，不能直接加入項目
+SEARCH_CASES = ["220V", "110v", "5.5MM", "插座"]
+
+
+def main():
+    catalog = ServiceCatalog.load(os.path.join(ROOT, "services.json"))
+
+    def parse(text):
+        return parse_entries(text, is_name=lambda line: catalog.find_by_name(line) is not None, units=catalog.units)
+
+    failures = []
+    for text, expected in PARSE_CASES:
+        result = [(entry["name"], entry["quantity"]) for entry in parse(text)]
+        if result != expected:
+            failures.append(f"{text!r}：拆解為 {result}，預期 {expected}")
+    for text in SEARCH_CASES:
+        if is_batch(parse(text)):
+            failures.append(f"{text!r}：應當成關鍵字搜尋")
+    # 超過 MAX_ENTRIES 的行要留給呼叫端列出，不能默默截掉
+    lines = [f"插座 {n}" for n in range(1, MAX_ENTRIES + 6)]
+    parsed = parse("\n".join(lines))
+    if len(parsed) != len(lines):
+        failures.append(f"{len(lines)} 行只拆出 {len(parsed)} 行")
+
+    # 確認按鈕送出的文字再拆解時，數量仍是原本寫的（沒寫時為 1）
+    for text in ("110v", "插座 3", "5.5MM"):
+        resolved, ambiguous, _ = resolve_entries(parse(text), catalog)
+        quantity = parse(text)[0]["quantity"] or 1
+        for entry, options in ambiguous:
+            for option in options:
+                chosen = parse(entry_text(option["name"], entry))
+                if [(e["name"], e["quantity"]) for e in chosen] != [(option["name"], quantity)]:
+                    failures.append(f"{text!r}：確認按鈕「{entry_text(option['name'], entry)}」拆解為 {chosen}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print("✅ 通過" if not failures else f"❌ {len(failures)} 項不符")
+    sys.exit(0 if not failures else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""多個程序同時更新同一位使用者的會話，確認樂觀鎖不會讓 selected_items 遺失更新
+
+執行方式：python bench/verify_sessions.py [程序數] [每個程序新增的項目數] [--fake-redis]
+
+預設以 SESSION_STORE=database、SESSION_SHARED=1 測試（未設定 DATABASE_URL 時使用暫存的 SQLite）；
+設定 SESSION_STORE=redis 與 SESSION_REDIS_URL 可改測 Redis，
+加上 --fake-redis 會在本機啟動 fakeredis 的 TCP 伺服器代替（需安裝 fakeredis）。
+測 Redis 時也會確認 key 的保存期限是 SESSION_REDIS_TTL（預設 SESSION_EXPIRE_DAYS 天），而不是本地快取的閒置時間。
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USER_ID = "Uverify-shared"
+
+
+def worker(index, count, results):
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    import app
+    app.initialize()
+
+    service = next(s for s in app.catalog_loader.current if s.get('price_low') is not None)
+
+    def add_item(session):
+        session.selected_items = session.selected_items + [{
+            'service_id': service['id'],
+            'name': service['name'],
+            'unit': service['unit'],
+            'quantity': 1,
+            'price_low': service['price_low'],
+            'price_high': service['price_high'],
+            'total_low': service['price_low'],
+            'total_high': service['price_high'],
+            'remark': f"{index}-{n}",
+        }]
+        app.session_cache.commit(session)
+
+    errors = 0
+    for n in range(count):
+        try:
+            app.with_session(USER_ID, add_item)
+        except Exception as e:
+            errors += 1
+            print(f"❌ 程序 {index} 第 {n} 次更新失敗：{e}")
+    results.put((index, errors, app.session_cache.stats()["stale"]))
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    processes = int(args[0]) if len(args) > 0 else 4
+    count = int(args[1]) if len(args) > 1 else 25
+    os.environ.setdefault("SESSION_STORE", "database")
+    os.environ["SESSION_SHARED"] = "1"
+    os.environ["CATALOG_POLL_INTERVAL"] = "0"
+    os.environ["NOTIFY_INTERVAL"] = "3600"
+    # 同一位使用者高度競爭，重試次數放寬
+    os.environ.setdefault("SESSION_CONFLICT_RETRIES", str(processes * count))
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "verify.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    if "--fake-redis" in sys.argv:
+        from fakeredis import TcpFakeServer
+        server = TcpFakeServer(("127.0.0.1", 0))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        os.environ["SESSION_STORE"] = "redis"
+        os.environ["SESSION_REDIS_URL"] = f"redis://127.0.0.1:{server.server_address[1]}/0"
+    print(f"🗄️ 會話存放：{os.environ['SESSION_STORE']}（{os.getenv('SESSION_REDIS_URL') if os.environ['SESSION_STORE'] == 'redis' else os.environ['DATABASE_URL']}）")
+
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    import app
+    app.initialize()
+    if os.environ["SESSION_STORE"] == "redis":
+        app.session_store.client.delete(app.session_store.key(USER_ID))
+    else:
+        with app.app.app_context():
+            row = app.UserSession.query.filter_by(line_user_id=USER_ID).first()
+            if row is not None:
+                app.SessionItem.query.filter_by(session_id=row.id).delete()
+                app.db.session.delete(row)
+                app.db.session.commit()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    started = time.perf_counter()
+    procs = [ctx.Process(target=worker, args=(i, count, results)) for i in range(processes)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - started
+    errors = stale = 0
+    while not results.empty():
+        index, failed, reloads = results.get()
+        errors += failed
+        stale += reloads
+
+    items = app.load_session(USER_ID)['selected_items']
+    expected = processes * count
+    unique = len({item['remark'] for item in items})
+    print(f"⏱️ {processes} 個程序各新增 {count} 個項目，耗時 {elapsed:.2f}s，重新載入 {stale} 次")
+    print(f"📊 項目 {len(items)}/{expected}，不重複 {unique}，失敗 {errors}")
+    ok = errors == 0 and len(items) == expected and unique == expected
+    if os.environ["SESSION_STORE"] == "redis":
+        # Redis 的 key 要保存到閒置會話的期限，不能跟著本地快取的閒置時間（SESSION_CACHE_TTL）過期
+        ttl = app.session_store.client.ttl(app.session_store.key(USER_ID))
+        limit = app.app.config['SESSION_REDIS_TTL'] or int(app.app.config['SESSION_EXPIRE_DAYS'] * 86400)
+        print(f"⌛ Redis key 剩餘 {ttl}s（保存期限 {limit}s，本地快取 {app.app.config['SESSION_CACHE_TTL']}s）")
+        if not app.app.config['SESSION_CACHE_TTL'] < ttl <= limit:
+            print("❌ Redis key 的保存期限不符")
+            ok = False
+    print("✅ 通過" if ok else "❌ 有更新遺失")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# 單一項目的數量上限；避免誤植的超大數字讓金額溢位、寫不進資料庫
+MAX_QUANTITY = 9999
+
+
+def check_quantity(quantity):
+    """數量需為 1 ~ MAX_QUANTITY 的整數，否則丟出 ValueError"""
+    if quantity <= 0 or quantity > MAX_QUANTITY:
+        raise ValueError(f"數量必須是 1 ~ {MAX_QUANTITY} 的正整數")
+
+
+def unit_price(service, quantity):
+    """依數量級距取得單價 (price_low, price_high)；專人報價項目回傳 (None, None)"""
+    price_low, price_high = service.get('price_low'), service.get('price_high')
+    if price_low is None:
+        return None, None
+    for tier in sorted(service.get('tiers', ()), key=lambda t: t['min_quantity']):
+        if quantity >= tier['min_quantity']:
+            price_low, price_high = tier['price_low'], tier['price_high']
+    return price_low, price_high
+
+
+def is_quote_item(item):
+    """專人報價的項目：沒有單價，不計入總金額"""
+    return item.get('price_low') is None
+
+
+class EstimateCart:
+    """已選項目與即時總價，對話流程與 LIFF 表單共用
+
+    items 直接使用會話的 selected_items（同一個 list），每個項目的 total_low/total_high 由這裡寫入；
+    新增、修改、刪除時只調整變動的部分，總價不必每次重新加總。
+    金額都是整數（新台幣元，服務目錄的最小單位），不經過浮點運算。
+    catalog 提供數量級距與組合折扣，沒有 catalog 時以項目上的單價計算。
+    """
+
+    def __init__(self, items=None, catalog=None):
+        self.items = items if items is not None else []
+        self.catalog = catalog
+        self.subtotal_low = 0
+        self.subtotal_high = 0
+        self.quote_count = 0
+        self._quantities = {}  # service_id -> 已選數量，組合折扣用
+        self.discounts = {}  # 組合名稱 -> (折抵下限, 折抵上限)
+        for item in self.items:
+            self._price(item, item['quantity'])
+            self._apply(item, 1)
+        for bundle in (catalog.bundles if catalog is not None else ()):
+            self._check_bundle(bundle)
+
+    @property
+    def discount_low(self):
+        return sum(low for low, _ in self.discounts.values())
+
+    @property
+    def discount_high(self):
+        return sum(high for _, high in self.discounts.values())
+
+    @property
+    def total_low(self):
+        return max(0, self.subtotal_low - self.discount_low)
+
+    @property
+    def total_high(self):
+        return max(0, self.subtotal_high - self.discount_high)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def add(self, service, quantity=1):
+        """加入一個服務項目，回傳新增的項目 dict；數量超出範圍時丟出 ValueError"""
+        check_quantity(quantity)
+        item = {
+            'service_id': service['id'],
+            'name': service['name'],
+            'unit': service['unit'],
+            'quantity': quantity,
+            'remark': service.get('remark', ''),
+        }
+        self._price(item, quantity, service)
+        self.items.append(item)
+        self._apply(item, 1)
+        self._recheck(item)
+        return item
+
+    def set_quantity(self, index, quantity):
+        """修改第 index 個項目（從 0 開始）的數量；專人報價項目不能修改，丟出 ValueError"""
+        item = self.items[index]
+        check_quantity(quantity)
+        if is_quote_item(item):
+            raise ValueError("專人報價項目無法修改數量")
+        self._apply(item, -1)
+        self._price(item, quantity)
+        self._apply(item, 1)
+        self._recheck(item)
+        return item
+
+    def remove(self, index):
+        """刪除第 index 個項目（從 0 開始），回傳被刪除的項目"""
+        item = self.items[index]
+        self._apply(item, -1)
+        del self.items[index]
+        self._recheck(item)
+        return item
+
+    def _price(self, item, quantity, service=None):
+        if service is None and self.catalog is not None and item.get('service_id') is not None:
+            service = self.catalog.get(item['service_id'])
+        if service is None:
+            # 目錄中已沒有這個項目，沿用項目上的單價
+            service = {'price_low': item.get('price_low'), 'price_high': item.get('price_high')}
+        price_low, price_high = unit_price(service, quantity)
+        item['quantity'] = quantity
+        item['price_low'] = price_low
+        item['price_high'] = price_high
+        item['total_low'] = price_low * quantity if price_low is not None else 0
+        item['total_high'] = price_high * quantity if price_high is not None else 0
+
+    def _apply(self, item, sign):
+        self.subtotal_low += sign * item['total_low']
+        self.subtotal_high += sign * item['total_high']
+        if is_quote_item(item):
+            self.quote_count += sign
+        service_id = item.get('service_id')
+        if service_id is not None:
+            self._quantities[service_id] = self._quantities.get(service_id, 0) + sign * item['quantity']
+
+    def _recheck(self, item):
+        # 只重新檢查跟這個項目有關的組合
+        if self.catalog is None or item.get('service_id') is None:
+            return
+        for bundle in self.catalog.bundles_by_service.get(item['service_id'], ()):
+            self._check_bundle(bundle)
+
+    def _check_bundle(self, bundle):
+        if all(self._quantities.get(service_id, 0) > 0 for service_id in bundle['service_ids']):
+            self.discounts[bundle['name']] = (bundle['discount_low'], bundle['discount_high'])
+        else:
+            self.discounts.pop(bundle['name'], None)
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from search import ServiceSearchIndex
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceCatalog:
+    """服務項目索引：啟動時建立一次，依 ID 或名稱 O(1) 查詢，並預先切好分頁與關鍵字搜尋索引
+
+    服務項目可帶 tiers（數量級距價格），目錄可帶 bundles（同時選了指定項目時折抵的金額），
+    兩者的格式見 README。
+    """
+
+    def __init__(self, services, items_per_page=10, bundles=()):
+        self.services = services
+        self.bundles = list(bundles)
+        self.items_per_page = items_per_page
+        for service in services:
+            # services.json 以 0/0 表示專人報價，統一成 null，與 is_quote_item 的判斷一致
+            if service.get('price_low') == 0 and service.get('price_high') == 0:
+                service['price_low'] = service['price_high'] = None
+        # 以內容雜湊當版本，內容相同的目錄版本也相同；沒有組合折扣時與舊版的雜湊一致
+        canonical = json.dumps(self.to_data(), ensure_ascii=False, sort_keys=True)
+        self.version = hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+        self.by_id = {}
+        self.by_name = {}
+        for service in services:
+            if not isinstance(service.get('id'), int):
+                raise ValueError(f"服務項目缺少整數 id：{service.get('name')}")
+            if service['id'] in self.by_id:
+                raise ValueError(f"服務項目 id 重複：{service['id']}")
+            if service['name'] in self.by_name:
+                raise ValueError(f"服務項目名稱重複：{service['name']}")
+            if not service.get('unit'):
+                raise ValueError(f"服務項目缺少單位：{service['name']}")
+            for field in ('price_low', 'price_high'):
+                if service.get(field) is not None and not isinstance(service[field], int):
+                    raise ValueError(f"服務項目 {service['name']} 的 {field} 必須是整數")
+            for tier in service.get('tiers', ()):
+                if not isinstance(tier.get('min_quantity'), int) or tier['min_quantity'] < 1:
+                    raise ValueError(f"服務項目 {service['name']} 的級距缺少正整數 min_quantity")
+                if not all(isinstance(tier.get(field), int) for field in ('price_low', 'price_high')):
+                    raise ValueError(f"服務項目 {service['name']} 的級距價格必須是整數")
+            self.by_id[service['id']] = service
+            self.by_name[service['name']] = service
+        self.bundles_by_service = {}
+        for bundle in self.bundles:
+            if not bundle.get('name') or not bundle.get('service_ids'):
+                raise ValueError(f"組合折扣缺少 name 或 service_ids：{bundle}")
+            for field in ('discount_low', 'discount_high'):
+                if not isinstance(bundle.get(field), int) or bundle[field] < 0:
+                    raise ValueError(f"組合折扣 {bundle['name']} 的 {field} 必須是非負整數")
+            for service_id in bundle['service_ids']:
+                if service_id not in self.by_id:
+                    raise ValueError(f"組合折扣 {bundle['name']} 引用不存在的服務項目 id：{service_id}")
+                self.bundles_by_service.setdefault(service_id, []).append(bundle)
+        self.units = frozenset(service['unit'] for service in services)
+        self.total_pages = max(1, math.ceil(len(services) / items_per_page))
+        self.pages = [
+            services[start:start + items_per_page]
+            for start in range(0, len(services), items_per_page)
+        ] or [[]]
+        self.search_index = ServiceSearchIndex(services)
+
+    @classmethod
+    def from_data(cls, data, items_per_page=10):
+        """services.json 可以是服務項目清單，或 {"services": [...], "bundles": [...]}"""
+        if isinstance(data, dict):
+            return cls(data['services'], items_per_page=items_per_page, bundles=data.get('bundles', ()))
+        return cls(data, items_per_page=items_per_page)
+
+    @classmethod
+    def load(cls, path, items_per_page=10):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_data(json.load(f), items_per_page=items_per_page)
+
+    def to_data(self):
+        """from_data 的反向，用於快照"""
+        if self.bundles:
+            return {'services': self.services, 'bundles': self.bundles}
+        return self.services
+
+    def get(self, service_id):
+        return self.by_id.get(service_id)
+
+    def find_by_name(self, name):
+        return self.by_name.get(name)
+
+    def resolve(self, key):
+        """依 ID（整數或數字字串）查詢；舊版以名稱傳遞的 postback 也能對應"""
+        if isinstance(key, int):
+            return self.by_id.get(key)
+        if key is None:
+            return None
+        key = str(key).strip()
+        if key.isdigit() and int(key) in self.by_id:
+            return self.by_id[int(key)]
+        return self.by_name.get(key)
+
+    def search(self, query, limit=10):
+        """依關鍵字（名稱、備註）找出最符合的服務項目"""
+        return self.search_index.search(query, limit=limit)
+
+    def lookup(self, query, limit=5):
+        """一行輸入對應的服務：(服務, []) 或無法確定時的 (None, 候選項目)"""
+        return self.search_index.lookup(query, limit=limit)
+
+    def page(self, page):
+        """第 page 頁的服務項目（從 1 開始）"""
+        if page < 1 or page > len(self.pages):
+            return []
+        return self.pages[page - 1]
+
+    def __len__(self):
+        return len(self.services)
+
+    def __iter__(self):
+        return iter(self.services)
+
+
+class CatalogLoader:
+    """監看 services.json，內容變更時驗證並原子替換成新版本的目錄
+
+    舊版本保留在 versions 中，進行中的會話仍可依自己的版本計價；versions 最多保留 max_versions 個
+    （LRU，目前版本不會被淘汰），記憶體中找不到的版本會透過 fetch(version) 取回（例如從資料庫快照），
+    回傳 to_data() 的內容。
+    """
+
+    def __init__(self, path, items_per_page=10, interval=2.0, on_load=None, fetch=None, max_versions=8):
+        self.path = path
+        self.items_per_page = items_per_page
+        self.interval = interval
+        self.on_load = on_load
+        self.fetch = fetch
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime
+        self.current = ServiceCatalog.load(path, items_per_page=items_per_page)
+        self.versions = OrderedDict([(self.current.version, self.current)])
+        self.reloads = 0
+        self._thread = None
+
+    def check(self):
+        """檔案有變動時重新載入，回傳是否換上新版本"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            logger.warning(f"⚠️ 無法讀取服務目錄：{e}")
+            return False
+        if mtime == self._mtime:
+            return False
+        with self._lock:
+            self._mtime = mtime
+            try:
+                catalog = ServiceCatalog.load(self.path, items_per_page=self.items_per_page)
+            except (OSError, ValueError) as e:
+                # JSON 格式錯誤或驗證失敗時保留目前版本
+                logger.error(f"❌ 服務目錄載入失敗，沿用版本 {self.current.version}：{e}")
+                return False
+            if catalog.version == self.current.version:
+                return False
+            self.current = catalog
+            self._remember(catalog)
+            self.reloads += 1
+        logger.info(f"🔄 服務目錄已更新為版本 {catalog.version}", extra={"catalog_version": catalog.version})
+        if self.on_load is not None:
+            self.on_load(catalog)
+        return True
+
+    def get(self, version=None):
+        """取得指定版本的目錄，找不到時回傳目前版本"""
+        if version is None:
+            return self.current
+        with self._lock:
+            catalog = self.versions.get(version)
+            if catalog is not None:
+                self.versions.move_to_end(version)
+                return catalog
+        if self.fetch is not None:
+            data = self.fetch(version)
+            if data is not None:
+                catalog = ServiceCatalog.from_data(data, items_per_page=self.items_per_page)
+                with self._lock:
+                    self._remember(catalog, version)
+        return catalog or self.current
+
+    def _remember(self, catalog, version=None):
+        # 呼叫端須持有 _lock；淘汰最久沒用到的舊版本，需要時再從快照取回
+        version = version or catalog.version
+        self.versions[version] = catalog
+        self.versions.move_to_end(version)
+        for old in list(self.versions):
+            if len(self.versions) <= self.max_versions:
+                break
+            if self.versions[old] is not self.current:
+                del self.versions[old]
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="catalog-watch", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
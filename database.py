@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+DEFAULT_DATABASE_URL = 'sqlite:///linebot_estimate.db'
+
+
+def database_url():
+    """DATABASE_URL 未設定時沿用 SQLite；Heroku 等平台給的 postgres:// 轉成 SQLAlchemy 的寫法"""
+    url = os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL)
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def engine_options(url):
+    """依資料庫種類產生 SQLALCHEMY_ENGINE_OPTIONS
+
+    PostgreSQL 等伺服器型資料庫使用連線池（DB_POOL_SIZE、DB_MAX_OVERFLOW、DB_POOL_TIMEOUT、DB_POOL_RECYCLE）；
+    SQLite 只設定等待鎖的秒數，WAL 等設定由 configure_sqlite 在連線時套用。
+    """
+    if is_sqlite(url):
+        return {'connect_args': {'timeout': sqlite_busy_timeout() / 1000}}
+    return {
+        'pool_size': int(os.getenv("DB_POOL_SIZE", "10")),
+        'max_overflow': int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        'pool_timeout': float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        'pool_recycle': int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        'pool_pre_ping': True,
+    }
+
+
+def sqlite_busy_timeout():
+    return int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+
+
+def configure_sqlite(engine):
+    """SQLite 改用 WAL：讀取不會被寫入擋住，多個程序寫入時等待 busy_timeout 毫秒而不是立即失敗"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={sqlite_busy_timeout()}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
+class QueryTimer:
+    """累計每個執行緒花在執行 SQL 的時間，讓路由統計可以分出資料庫耗時
+
+    on_query(秒數) 在每個 SQL 執行後呼叫；on_commit(秒數) 在交易提交（含 flush）後呼叫。
+    """
+
+    def __init__(self, on_query=None, on_commit=None):
+        self.on_query = on_query
+        self.on_commit = on_commit
+        self._local = threading.local()
+
+    def install(self, engine, session=None):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_query(conn, cursor, statement, parameters, context, executemany):
+            context._query_started = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def finish_query(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - context._query_started
+            self._local.total = self.elapsed() + elapsed
+            if self.on_query is not None:
+                self.on_query(elapsed)
+
+        if session is not None and self.on_commit is not None:
+            @event.listens_for(session, 'before_commit')
+            def start_commit(session):
+                session.info['_commit_started'] = time.perf_counter()
+
+            @event.listens_for(session, 'after_commit')
+            def finish_commit(session):
+                started = session.info.pop('_commit_started', None)
+                if started is not None:
+                    self.on_commit(time.perf_counter() - started)
+
+            @event.listens_for(session, 'after_rollback')
+            def discard_commit(session):
+                session.info.pop('_commit_started', None)
+
+    def elapsed(self):
+        """目前執行緒累計的 SQL 秒數"""
+        return getattr(self._local, 'total', 0.0)
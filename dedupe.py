@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class EventDeduplicator:
+    """依 webhookEventId 過濾 LINE 重送的事件
+
+    seen() 先保留事件 ID，處理成功後 confirm() 才記為已處理；處理失敗時 release()，
+    LINE 重送同一事件時才會再處理一次。保留中的 ID 超過 pending_timeout 秒沒有結果
+    （例如程序中途結束）就視為失效。
+    記憶體中保留 window 秒內（最多 maxsize 筆）處理過的 ID；
+    指定 path 時已處理的 ID 同時寫入 SQLite，重啟後或多個程序之間也能辨識重複事件。
+    """
+
+    def __init__(self, window=86400, maxsize=100000, path=None, pending_timeout=300):
+        self.window = window
+        self.maxsize = maxsize
+        self.pending_timeout = pending_timeout
+        self._seen = OrderedDict()
+        self._pending = {}  # event_id -> 保留時間
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS processed_event ("
+                " event_id TEXT PRIMARY KEY,"
+                " processed_at REAL NOT NULL)"
+            )
+        self._last_prune = time.time()
+        self.checked = 0
+        self.duplicates = 0
+        self.redeliveries = 0
+        self.released = 0
+
+    def seen(self, event_id, is_redelivery=False):
+        """已處理過或正在處理時回傳 True；否則保留這個 ID 並回傳 False，之後須 confirm() 或 release()"""
+        if not event_id:
+            return False
+        now = time.time()
+        with self._lock:
+            self.checked += 1
+            if is_redelivery:
+                self.redeliveries += 1
+            self._prune(now)
+            reserved_at = self._pending.get(event_id)
+            processed_at = self._seen.get(event_id)
+            if processed_at is None and self._conn is not None:
+                processed_at = self._load(event_id)
+            if ((reserved_at is not None and now - reserved_at <= self.pending_timeout)
+                    or (processed_at is not None and now - processed_at <= self.window)):
+                self.duplicates += 1
+                return True
+            self._pending[event_id] = now
+            return False
+
+    def confirm(self, event_id):
+        """事件已處理（或已放進佇列），記為已處理"""
+        if not event_id:
+            return
+        now = time.time()
+        with self._lock:
+            self._pending.pop(event_id, None)
+            self._seen[event_id] = now
+            self._seen.move_to_end(event_id)
+            if self._conn is not None:
+                self._persist(event_id, now)
+
+    def release(self, event_id):
+        """事件處理失敗，放掉保留的 ID，讓重送的事件可以再處理"""
+        if not event_id:
+            return
+        with self._lock:
+            if self._pending.pop(event_id, None) is not None:
+                self.released += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "duplicates": self.duplicates,
+                "redeliveries": self.redeliveries,
+                "released": self.released,
+                "pending": len(self._pending),
+                "tracked": len(self._seen),
+            }
+
+    def _load(self, event_id):
+        # 其他程序（或重啟前）處理過的事件
+        row = self._conn.execute(
+            "SELECT processed_at FROM processed_event WHERE event_id = ?", (event_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _persist(self, event_id, now):
+        # 超過時間窗的舊紀錄直接覆蓋
+        self._conn.execute(
+            "INSERT OR REPLACE INTO processed_event (event_id, processed_at) VALUES (?, ?)",
+            (event_id, now)
+        )
+
+    def _prune(self, now):
+        while self._seen and len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+        while self._seen:
+            event_id, processed_at = next(iter(self._seen.items()))
+            if now - processed_at <= self.window:
+                break
+            self._seen.popitem(last=False)
+        for event_id in [k for k, reserved_at in self._pending.items() if now - reserved_at > self.pending_timeout]:
+            del self._pending[event_id]
+        if self._conn is not None and now - self._last_prune > 600:
+            self._conn.execute("DELETE FROM processed_event WHERE processed_at < ?", (now - self.window,))
+            self._last_prune = now
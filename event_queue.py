@@ -0,0 +1,277 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryQueueBackend:
+    """程序內的有界佇列"""
+
+    def __init__(self, maxsize=1000):
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, payload, enqueued_at):
+        # 佇列已滿時丟出 queue.Full，由 EventQueue 計入 dropped
+        self._queue.put_nowait((None, payload, enqueued_at))
+
+    def get(self, timeout=1.0):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def ack(self, item_id):
+        pass
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+class SqliteQueueBackend:
+    """以 SQLite 資料表保存待處理事件，程序重啟後可接續處理"""
+
+    def __init__(self, path, maxsize=1000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS webhook_queue ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL,"
+            " enqueued_at REAL NOT NULL,"
+            " claimed_at REAL)"
+        )
+        # 上次程序中斷時已取出但未完成的事件，重新放回佇列
+        self._conn.execute("UPDATE webhook_queue SET claimed_at = NULL WHERE claimed_at IS NOT NULL")
+
+    def put(self, payload, enqueued_at):
+        with self._not_empty:
+            if self._count() >= self.maxsize:
+                raise queue.Full
+            self._conn.execute(
+                "INSERT INTO webhook_queue (payload, enqueued_at) VALUES (?, ?)",
+                (json.dumps(payload, ensure_ascii=False), enqueued_at)
+            )
+            self._not_empty.notify()
+
+    def get(self, timeout=1.0):
+        with self._not_empty:
+            row = self._claim()
+            if row is None:
+                self._not_empty.wait(timeout)
+                row = self._claim()
+        if row is None:
+            return None
+        item_id, payload, enqueued_at = row
+        return item_id, json.loads(payload), enqueued_at
+
+    def ack(self, item_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM webhook_queue WHERE id = ?", (item_id,))
+
+    def qsize(self):
+        with self._lock:
+            return self._count()
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM webhook_queue").fetchone()[0]
+
+    def _claim(self):
+        row = self._conn.execute(
+            "SELECT id, payload, enqueued_at FROM webhook_queue"
+            " WHERE claimed_at IS NULL ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row is not None:
+            self._conn.execute("UPDATE webhook_queue SET claimed_at = ? WHERE id = ?", (time.time(), row[0]))
+        return row
+
+
+class KeyedScheduler:
+    """依 key 分片執行：同一 key 的工作嚴格依序，不同分片之間平行處理"""
+
+    def __init__(self, shards=4, backlog=1000):
+        self.shards = shards
+        self._lanes = [queue.Queue(maxsize=backlog) for _ in range(shards)]
+        self._processed = [0] * shards
+        self._max_backlog = [0] * shards
+        self._dropped = [0] * shards
+        self._threads = []
+        self._running = False
+
+    def shard_for(self, key):
+        # 用 crc32 而非 hash()，讓同一使用者在不同程序中也落在同一分片
+        return zlib.crc32((key or "").encode("utf-8")) % self.shards
+
+    def submit(self, key, func):
+        """放入對應分片並回傳分片編號；分片已滿時回傳 None
+
+        不阻塞呼叫端：一位使用者塞滿自己的分片時，其他分片的事件照常分派。
+        """
+        shard = self.shard_for(key)
+        lane = self._lanes[shard]
+        try:
+            lane.put_nowait(func)
+        except queue.Full:
+            self._dropped[shard] += 1
+            return None
+        self._max_backlog[shard] = max(self._max_backlog[shard], lane.qsize())
+        return shard
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for shard in range(self.shards):
+            thread = threading.Thread(target=self._run_lane, args=(shard,), name=f"webhook-shard-{shard}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self):
+        return [
+            {
+                "shard": shard,
+                "backlog": self._lanes[shard].qsize(),
+                "max_backlog": self._max_backlog[shard],
+                "processed": self._processed[shard],
+                "dropped": self._dropped[shard],
+            }
+            for shard in range(self.shards)
+        ]
+
+    def _run_lane(self, shard):
+        lane = self._lanes[shard]
+        while self._running:
+            try:
+                func = lane.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            func()
+            self._processed[shard] += 1
+
+
+class EventQueue:
+    """/callback 收到的事件先放進佇列，由背景工作執行緒處理
+
+    指定 scheduler 與 key 時，改由單一分派執行緒依 FIFO 取出事件，
+    再依 key(payload) 交給 KeyedScheduler 的分片執行，確保同一使用者的事件不會併發；
+    分片已滿時該事件計入 dropped，分派執行緒不會等待。
+    """
+
+    def __init__(self, process, backend=None, workers=4, scheduler=None, key=None):
+        self.process = process
+        self.backend = backend or MemoryQueueBackend()
+        self.workers = workers
+        self.scheduler = scheduler
+        self.key = key
+        self._threads = []
+        self._running = False
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        if self.scheduler is not None:
+            self.scheduler.start()
+            targets = [self._dispatch]
+        else:
+            targets = [self._worker] * self.workers
+        for i, target in enumerate(targets):
+            thread = threading.Thread(target=target, name=f"webhook-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self.scheduler is not None:
+            self.scheduler.stop(timeout)
+
+    def enqueue(self, payload):
+        """放入事件，佇列已滿時回傳 False"""
+        try:
+            self.backend.put(payload, time.time())
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+        with self._stats_lock:
+            self.enqueued += 1
+        return True
+
+    def stats(self):
+        with self._stats_lock:
+            done = self.processed + self.failed
+            stats = {
+                "depth": self.backend.qsize(),
+                "workers": self.workers,
+                "enqueued": self.enqueued,
+                "processed": self.processed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "wait_avg_ms": round(self._wait_total / done * 1000, 2) if done else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 2),
+            }
+        if self.scheduler is not None:
+            stats["workers"] = self.scheduler.shards
+            stats["shards"] = self.scheduler.stats()
+        return stats
+
+    def _worker(self):
+        while self._running:
+            item = self.backend.get(timeout=0.5)
+            if item is not None:
+                self._run(item)
+
+    def _dispatch(self):
+        while self._running:
+            item = self.backend.get(timeout=0.5)
+            if item is None:
+                continue
+            key = self.key(item[1])
+            if self.scheduler.submit(key, lambda item=item: self._run(item)) is None:
+                # 該分片已滿：只丟棄這個事件，不讓分派執行緒卡住其他分片
+                self.backend.ack(item[0])
+                with self._stats_lock:
+                    self.dropped += 1
+                logger.warning(f"⚠️ 分片 {self.scheduler.shard_for(key)} 已滿，丟棄事件")
+
+    def _run(self, item):
+        item_id, payload, enqueued_at = item
+        waited = time.time() - enqueued_at
+        try:
+            self.process(payload)
+            ok = True
+        except Exception as e:
+            logger.exception(f"❌ 事件處理失敗: {e}")
+            ok = False
+        finally:
+            self.backend.ack(item_id)
+        with self._stats_lock:
+            if ok:
+                self.processed += 1
+            else:
+                self.failed += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
@@ -0,0 +1,60 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+
+
+def encode_cursor(created_at, row_id):
+    """keyset 分頁的游標：最後一筆的 (created_at, id)"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """解析游標，格式錯誤時丟出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, row_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (UnicodeError, ValueError, TypeError) as e:
+        raise ValueError(f"無效的游標：{cursor}") from e
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def ndjson_chunk(rows):
+    """一批 dict 轉成 NDJSON 文字（每列一行）"""
+    return ''.join(json.dumps(row, ensure_ascii=False, default=_json_default) + '\n' for row in rows)
+
+
+class CsvWriter:
+    """逐批輸出 CSV，第一批前加上標題列"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self._header = True
+
+    def chunk(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if self._header:
+            writer.writerow(self.columns)
+            self._header = False
+        for row in rows:
+            writer.writerow([_csv_value(row.get(column)) for column in self.columns])
+        return buffer.getvalue()
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
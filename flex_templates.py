@@ -0,0 +1,145 @@
+import json
+
+from cart import is_quote_item
+from message_cache import PrebuiltMessage
+
+# LINE 的上限：單一 bubble 30KB，carousel 50KB 且最多 12 個 bubble
+BUBBLE_MAX_BYTES = 30000
+CAROUSEL_MAX_BYTES = 50000
+CAROUSEL_MAX_BUBBLES = 12
+# 預留給外層結構與逗號的空間
+SIZE_MARGIN = 512
+
+LOGO_URL = "https://i.postimg.cc/BnPL07jc/line-oa-chat-250628-214335.jpg"
+
+
+def _size(obj):
+    # 與 LineBotApi 送出時相同的序列化方式（ensure_ascii），才能準確估算大小
+    return len(json.dumps(obj))
+
+
+# 估價單的固定部分，只建立一次，每張估價單共用同一份 dict
+SEPARATOR = {"type": "separator", "margin": "md"}
+ESTIMATE_HEADER = [
+    {"type": "image", "url": LOGO_URL, "margin": "none", "align": "center", "gravity": "center",
+     "size": "md", "aspectRatio": "1:1", "aspectMode": "fit", "animated": False},
+    {"type": "text", "text": "心感覺企業", "margin": "xs", "size": "sm", "align": "center",
+     "gravity": "center", "color": "#888888"},
+    {"type": "text", "text": "📥 心感覺估價單", "margin": "md", "size": "xl", "weight": "bold"},
+    SEPARATOR,
+]
+ITEMS_TITLE = {"type": "text", "text": "🔧 項目明細：", "margin": "md", "weight": "bold"}
+ITEMS_CONTINUED_TITLE = {"type": "text", "text": "🔧 項目明細（續）：", "margin": "md", "weight": "bold"}
+BOOKING_FOOTER = {
+    "type": "box",
+    "layout": "vertical",
+    "contents": [
+        {"type": "button", "action": {"type": "postback", "label": "✅ 我要預約", "data": "confirm_booking"},
+         "style": "primary"}
+    ]
+}
+HEADER_BYTES = _size(ESTIMATE_HEADER)
+FOOTER_BYTES = _size(BOOKING_FOOTER)
+BUBBLE_BYTES = _size({"type": "bubble", "body": {"type": "box", "layout": "vertical", "contents": []}})
+
+# 選完項目、修改或刪除後的「確認估價」按鈕，內容固定，整個訊息只序列化一次
+CONFIRM_ESTIMATE_MESSAGE = PrebuiltMessage({
+    "type": "flex",
+    "altText": "請確認估價",
+    "contents": {
+        "type": "bubble",
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "spacing": "md",
+            "contents": [
+                {"type": "text", "text": "✅ 若無需修改，請點下方按鈕確認估價", "wrap": True}
+            ]
+        },
+        "footer": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {"type": "button", "action": {"type": "postback", "label": "✅ 確認估價", "data": "confirm_estimate"},
+                 "style": "primary"}
+            ]
+        }
+    }
+})
+
+
+def item_component(item):
+    if is_quote_item(item):
+        text = f"▫️ {item['name']} ×{item['quantity']}{item['unit']}\n 💬 將由專人聯繫報價"
+    else:
+        text = (
+            f"▫️ {item['name']} ×{item['quantity']}{item['unit']}\n"
+            f" ➜ NT${item['total_low']:,} ~ NT${item['total_high']:,}"
+        )
+    if item.get('remark'):
+        text += f"\n  📌 {item['remark']}"
+    return {"type": "text", "text": text, "size": "sm", "wrap": True}
+
+
+def render_estimate(name, phone, address, visit_time, items, totals_text):
+    """估價單訊息：只產生客戶資料、項目與總金額，其餘沿用預先建好的骨架
+
+    項目太多、超過單一 bubble 的大小時自動拆成多個 bubble 組成 carousel，
+    carousel 也放不下時再拆成多則訊息，回傳訊息 list。
+    """
+    customer = [
+        {"type": "text", "text": f"👤 {name}", "margin": "md"},
+        {"type": "text", "text": f"📞 {phone}"},
+        {"type": "text", "text": f"📍 {address}", "wrap": True},
+        {"type": "text", "text": f"📅 {visit_time}"},
+        SEPARATOR,
+        ITEMS_TITLE,
+    ]
+    tail = [
+        SEPARATOR,
+        {"type": "text", "text": totals_text, "margin": "md", "size": "lg", "wrap": True, "weight": "bold"},
+    ]
+    tail_bytes = _size(tail) + FOOTER_BYTES
+
+    pages = []
+    contents = ESTIMATE_HEADER + customer
+    size = BUBBLE_BYTES + HEADER_BYTES + _size(customer)
+    has_items = False
+    for item in items:
+        component = item_component(item)
+        component_bytes = _size(component) + 2
+        if has_items and size + component_bytes + tail_bytes > BUBBLE_MAX_BYTES - SIZE_MARGIN:
+            pages.append((contents, size))
+            contents = [ITEMS_CONTINUED_TITLE]
+            size = BUBBLE_BYTES + _size(contents)
+            has_items = False
+        contents.append(component)
+        size += component_bytes
+        has_items = True
+    pages.append((contents + tail, size + tail_bytes))
+
+    bubbles = []
+    for index, (contents, size) in enumerate(pages):
+        bubble = {"type": "bubble", "body": {"type": "box", "layout": "vertical", "contents": contents}}
+        if index == len(pages) - 1:
+            bubble["footer"] = BOOKING_FOOTER
+        bubbles.append((bubble, size))
+
+    messages = []
+    for group in _carousels(bubbles):
+        # 只有一個 bubble 時直接送出 bubble，不包成 carousel
+        contents = group[0] if len(group) == 1 else {"type": "carousel", "contents": group}
+        messages.append(PrebuiltMessage({"type": "flex", "altText": "估價單", "contents": contents}))
+    return messages
+
+
+def _carousels(bubbles):
+    group, size = [], 0
+    for bubble, bubble_bytes in bubbles:
+        if group and (len(group) >= CAROUSEL_MAX_BUBBLES or size + bubble_bytes > CAROUSEL_MAX_BYTES - SIZE_MARGIN):
+            yield group
+            group, size = [], 0
+        group.append(bubble)
+        size += bubble_bytes + 2
+    if group:
+        yield group
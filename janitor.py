@@ -0,0 +1,76 @@
+import json
+import logging
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+
+def pack_archive(record):
+    """把估價單（含項目）壓縮成封存用的 bytes"""
+    return zlib.compress(json.dumps(record, ensure_ascii=False, default=str).encode('utf-8'), 9)
+
+
+def unpack_archive(payload):
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+
+class Janitor:
+    """定期整理資料庫的背景工作
+
+    tasks 為 (名稱, 函式) 清單，依序執行；函式回傳一個統計 dict（如刪除筆數、回收位元組），
+    每輪的結果記在 last_report，數值欄位另外累計到 totals。
+    """
+
+    def __init__(self, tasks, interval=3600):
+        self.tasks = tasks
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self.runs = 0
+        self.failures = 0
+        self.last_run = None
+        self.last_report = {}
+        self.totals = {}
+
+    def run_once(self):
+        report = {}
+        for name, task in self.tasks:
+            try:
+                report[name] = task()
+            except Exception as e:
+                self.failures += 1
+                report[name] = {"error": str(e)}
+                logger.exception(f"❌ 資料整理 {name} 失敗: {e}")
+        with self._lock:
+            self.runs += 1
+            self.last_run = time.time()
+            self.last_report = report
+            for name, result in report.items():
+                totals = self.totals.setdefault(name, {})
+                for key, value in result.items():
+                    if isinstance(value, (int, float)):
+                        totals[key] = totals.get(key, 0) + value
+        logger.info(f"🧹 資料整理完成：{json.dumps(report, ensure_ascii=False)}", extra={"report": report})
+        return report
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="janitor", daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "failures": self.failures,
+                "last_run": self.last_run,
+                "last_report": self.last_report,
+                "totals": self.totals,
+            }
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.run_once()
@@ -0,0 +1,270 @@
+import asyncio
+import functools
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from linebot import AsyncLineBotApi, LineBotApi
+from linebot.async_http_client import AsyncHttpClient
+from linebot.http_client import HttpClient, RequestsHttpResponse
+
+# 需要重試的狀態碼：429 流量限制與暫時性的伺服器錯誤
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# 推播類 API 帶上 X-Line-Retry-Key，重試時 LINE 不會重複送出
+RETRY_KEY_PATHS = ('/v2/bot/message/push', '/v2/bot/message/multicast', '/v2/bot/message/broadcast')
+IDEMPOTENT_METHODS = {'GET', 'PUT', 'DELETE'}
+
+_context = threading.local()
+
+# 路徑中的使用者／群組 ID、訊息 ID 等換成 :id，讓指標的標籤數量固定
+_ID_SEGMENT = re.compile(r'/(?:[UCR][0-9a-f]{32}|\d+)(?=/|$)')
+
+
+def endpoint_label(url):
+    """LINE API 網址轉成指標用的端點名稱，例如 /v2/bot/profile/:id"""
+    return _ID_SEGMENT.sub('/:id', urlsplit(url).path)
+
+
+@contextmanager
+def collect_replies():
+    """這個執行緒接下來的 reply_message 只記錄成 (reply_token, messages)，不實際送出
+
+    async 執行環境在執行緒池中跑同步的處理函式，回覆收集起來之後改由 event loop 以非同步 client 送出。
+    """
+    replies = []
+    _context.replies = replies
+    try:
+        yield replies
+    finally:
+        _context.replies = None
+
+
+@contextmanager
+def retry_key(key):
+    """指定這個執行緒接下來推播使用的 X-Line-Retry-Key
+
+    LineBotApi 的 retry_key 參數會寫進共用的 headers 且不會清掉，多執行緒下不安全，改用這裡指定。
+    """
+    _context.retry_key = key
+    try:
+        yield
+    finally:
+        _context.retry_key = None
+
+
+class RetryPolicy:
+    """同步與非同步 client 共用的退避間隔、指標回報與統計"""
+
+    def _init_policy(self, max_retries, backoff, max_backoff, observe):
+        self.observe = observe
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+
+    def stats(self):
+        with self._stats_lock:
+            return {"requests": self.requests, "retries": self.retries, "errors": self.errors}
+
+    def _retry_after(self, headers):
+        """429/5xx 帶 Retry-After 秒數時照著等，否則為 None"""
+        retry_after = headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), self.max_backoff)
+        return None
+
+    def _delay(self, attempt):
+        # full jitter：0 ~ backoff * 2^attempt 之間隨機
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def _observe(self, url, status, started):
+        if self.observe is not None:
+            self.observe(endpoint_label(url), status, time.perf_counter() - started)
+
+    def _count(self, retries=0, errors=0):
+        with self._stats_lock:
+            self.requests += 1 if retries == 0 else 0
+            self.retries += retries
+            self.errors += errors
+
+
+def _retry_headers(method, url, headers):
+    headers = dict(headers or {})
+    if method == 'POST' and url.endswith(RETRY_KEY_PATHS):
+        headers.setdefault('X-Line-Retry-Key', getattr(_context, 'retry_key', None) or str(uuid.uuid4()))
+    return headers
+
+
+def _safe_to_resend(method, headers):
+    """請求可能已送達時仍可重送：GET 等冪等方法，或帶 X-Line-Retry-Key 讓 LINE 自行去重"""
+    return method in IDEMPOTENT_METHODS or 'X-Line-Retry-Key' in headers
+
+
+class PooledHttpClient(RetryPolicy, HttpClient):
+    """共用連線池的 HTTP client：逾時、429/5xx 抖動退避重試、並行上限
+
+    observe(端點, 狀態碼, 秒數) 在每次實際送出（含重試）後呼叫，連線失敗時狀態碼為 None。
+    """
+
+    def __init__(self, timeout=HttpClient.DEFAULT_TIMEOUT, pool_size=20, max_retries=3,
+                 backoff=0.5, max_backoff=8.0, max_concurrency=10, observe=None):
+        super().__init__(timeout)
+        self._init_policy(max_retries, backoff, max_backoff, observe)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def get(self, url, headers=None, params=None, stream=False, timeout=None):
+        return self._request('GET', url, headers=headers, params=params, stream=stream, timeout=timeout)
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        return self._request('POST', url, headers=headers, data=data, timeout=timeout)
+
+    def delete(self, url, headers=None, data=None, timeout=None):
+        return self._request('DELETE', url, headers=headers, data=data, timeout=timeout)
+
+    def put(self, url, headers=None, data=None, timeout=None):
+        return self._request('PUT', url, headers=headers, data=data, timeout=timeout)
+
+    def _request(self, method, url, headers=None, timeout=None, **kwargs):
+        headers = _retry_headers(method, url, headers)
+        timeout = timeout or self.timeout
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                with self._slots:
+                    response = self.session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+            except requests.ConnectionError as e:
+                self._observe(url, None, started)
+                # ConnectionError 也包含送出後才斷線（Connection aborted）的情況，
+                # 只有確定還沒連上（逾時或建立連線失敗）或重送安全時才重試
+                not_sent = (isinstance(e, requests.ConnectTimeout)
+                            or isinstance(getattr(e.args[0] if e.args else None, 'reason', None), NewConnectionError))
+                if not (not_sent or _safe_to_resend(method, headers)) or attempt >= self.max_retries:
+                    self._count(errors=1)
+                    raise
+            except requests.RequestException:
+                self._observe(url, None, started)
+                raise
+            else:
+                self._observe(url, response.status_code, started)
+                if response.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                    self._count(errors=1 if response.status_code >= 400 else 0)
+                    return RequestsHttpResponse(response)
+                wait = self._retry_after(response.headers)
+                if wait is not None:
+                    self._count(retries=1)
+                    attempt += 1
+                    time.sleep(wait)
+                    continue
+            self._count(retries=1)
+            time.sleep(self._delay(attempt))
+            attempt += 1
+
+
+class CollectingLineBotApi(LineBotApi):
+    """在 collect_replies() 之內的 reply_message 只記錄不送出，其餘行為與 LineBotApi 相同"""
+
+    def reply_message(self, reply_token, messages, notification_disabled=False, timeout=None):
+        replies = getattr(_context, 'replies', None)
+        if replies is None:
+            return super().reply_message(reply_token, messages, notification_disabled=notification_disabled,
+                                         timeout=timeout)
+        replies.append((reply_token, messages))
+
+
+class AsyncPooledHttpClient(RetryPolicy, AsyncHttpClient):
+    """PooledHttpClient 的 aiohttp 版本：同樣的逾時、退避重試、並行上限與指標，等待回應時不占用執行緒
+
+    回應內容在釋放連線前就讀完，呼叫端不用另外關閉。
+    """
+
+    def __init__(self, session, timeout=AsyncHttpClient.DEFAULT_TIMEOUT, max_retries=3,
+                 backoff=0.5, max_backoff=8.0, max_concurrency=10, observe=None):
+        super().__init__(timeout)
+        self._init_policy(max_retries, backoff, max_backoff, observe)
+        self.session = session
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def get(self, url, headers=None, params=None, timeout=None):
+        return await self._request('GET', url, headers=headers, params=params, timeout=timeout)
+
+    async def post(self, url, headers=None, data=None, timeout=None):
+        return await self._request('POST', url, headers=headers, data=data, timeout=timeout)
+
+    async def delete(self, url, headers=None, data=None, timeout=None):
+        return await self._request('DELETE', url, headers=headers, data=data, timeout=timeout)
+
+    async def put(self, url, headers=None, data=None, timeout=None):
+        return await self._request('PUT', url, headers=headers, data=data, timeout=timeout)
+
+    async def _request(self, method, url, headers=None, timeout=None, **kwargs):
+        import aiohttp
+        from linebot.aiohttp_async_http_client import AiohttpAsyncHttpResponse
+
+        headers = _retry_headers(method, url, headers)
+        timeout = timeout or self.timeout
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        client_timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                async with self._slots:
+                    response = await self.session.request(method, url, headers=headers, timeout=client_timeout,
+                                                          **kwargs)
+                    await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self._observe(url, None, started)
+                # 與 PooledHttpClient 相同：建立連線失敗或連線逾時代表請求沒送出，可以重試；
+                # 其他連線錯誤與讀取逾時可能已送達，只有重送安全時才重試
+                not_sent = isinstance(e, (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError))
+                if not (not_sent or _safe_to_resend(method, headers)) or attempt >= self.max_retries:
+                    self._count(errors=1)
+                    raise
+            else:
+                self._observe(url, response.status, started)
+                if response.status not in RETRY_STATUS or attempt >= self.max_retries:
+                    self._count(errors=1 if response.status >= 400 else 0)
+                    return AiohttpAsyncHttpResponse(response)
+                wait = self._retry_after(response.headers)
+                if wait is not None:
+                    self._count(retries=1)
+                    attempt += 1
+                    await asyncio.sleep(wait)
+                    continue
+            self._count(retries=1)
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+
+def create_line_bot_api(channel_access_token, endpoint=None, timeout=HttpClient.DEFAULT_TIMEOUT, **client_options):
+    """建立使用 PooledHttpClient 的 LineBotApi；endpoint 可指向本機的測試 stub"""
+    kwargs = {'timeout': timeout, 'http_client': functools.partial(PooledHttpClient, **client_options)}
+    if endpoint:
+        kwargs['endpoint'] = endpoint
+        kwargs['data_endpoint'] = endpoint
+    return CollectingLineBotApi(channel_access_token, **kwargs)
+
+
+def create_async_line_bot_api(channel_access_token, session, endpoint=None, timeout=HttpClient.DEFAULT_TIMEOUT,
+                              **client_options):
+    """建立使用 AsyncPooledHttpClient 的 AsyncLineBotApi；session 為呼叫端管理的 aiohttp.ClientSession"""
+    kwargs = {'async_http_client': AsyncPooledHttpClient(session, timeout=timeout, **client_options)}
+    if endpoint:
+        kwargs['endpoint'] = endpoint
+        kwargs['data_endpoint'] = endpoint
+    return AsyncLineBotApi(channel_access_token, **kwargs)
@@ -0,0 +1,43 @@
+import threading
+
+from linebot.models import SendMessage
+
+
+class PrebuiltMessage(SendMessage):
+    """已序列化好的訊息，送出時直接使用快取的 JSON dict，不再走訪物件樹"""
+
+    def __init__(self, payload):
+        super().__init__()
+        self.type = payload.get('type')
+        self._payload = payload
+
+    def as_json_dict(self):
+        return self._payload
+
+
+class TemplateCache:
+    """依版本快取已序列化的訊息，版本改變（例如服務目錄重新載入）時整批失效"""
+
+    def __init__(self):
+        self.version = None
+        self._items = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key, build):
+        """取得 key 對應的訊息，沒有時呼叫 build() 建立並序列化"""
+        with self._lock:
+            if version != self.version:
+                self._items = {}
+                self.version = version
+            message = self._items.get(key)
+            if message is not None:
+                self.hits += 1
+                return message
+        message = PrebuiltMessage(build().as_json_dict())
+        with self._lock:
+            self.misses += 1
+            if version == self.version:
+                self._items[key] = message
+        return message
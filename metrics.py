@@ -0,0 +1,197 @@
+import bisect
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# 預設的直方圖區間（秒），涵蓋 1ms ~ 10s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, values)} {_number(total)}")
+        return lines
+
+
+class Histogram:
+    """累計分布：observe 只在對應區間加一，輸出時才轉成 Prometheus 的累計格式"""
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label 值 -> [各區間次數..., 超出最大區間的次數, 總和, 次數]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {values: list(series) for values, series in self._series.items()}
+        for values, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = (('le', _number(bound)),)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, values)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, values)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """輸出時才呼叫 func 取值；func 可回傳數字，或 {label 值 tuple: 數字}"""
+
+    def __init__(self, name, help, func, labels=()):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.label_names = tuple(labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        value = self.func()
+        values = value if isinstance(value, dict) else {(): value}
+        for label_values, number in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {_number(number)}")
+        return lines
+
+
+class MetricsRegistry:
+    """指標登記處，render() 產生 Prometheus 文字格式（/metrics）"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, func, labels=()):
+        return self._register(Gauge(name, help, func, labels))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # 單一指標取值失敗不影響其他指標
+                lines.append(f"# {metric.name} 無法取得：{_escape(e)}")
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+class SamplingProfiler:
+    """依 sample_rate 抽樣以 cProfile 分析單次處理，結果依標籤（例如路由名稱）累計
+
+    sample_rate 可在執行中修改；同一時間只分析一個請求，忙碌時直接略過這次抽樣。
+    """
+
+    def __init__(self, sample_rate=0.0):
+        self.sample_rate = sample_rate
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.samples = {}
+
+    @contextmanager
+    def maybe_profile(self, label):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate or not self._busy.acquire(blocking=False):
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            yield
+        finally:
+            profile.disable()
+            self._busy.release()
+            self._merge(label, profile)
+
+    def report(self, label=None, limit=30, sort='cumulative'):
+        """累計結果的文字報表；label 為 None 時列出全部標籤"""
+        with self._lock:
+            labels = [label] if label is not None else sorted(self._stats)
+            output = io.StringIO()
+            for name in labels:
+                stats = self._stats.get(name)
+                if stats is None:
+                    continue
+                output.write(f"== {name}（{self.samples[name]} 次抽樣）==\n")
+                stats.stream = output
+                stats.sort_stats(sort).print_stats(limit)
+            return output.getvalue()
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+            self.samples = {}
+
+    def _merge(self, label, profile):
+        with self._lock:
+            stats = self._stats.get(label)
+            if stats is None:
+                self._stats[label] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self.samples[label] = self.samples.get(label, 0) + 1
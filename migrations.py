@@ -0,0 +1,128 @@
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+# 項目明細欄位，與 SessionItem / EstimateItem 一致
+ITEM_COLUMNS = ('service_name', 'unit', 'quantity', 'price_low', 'price_high', 'total_low', 'total_high', 'remark')
+
+
+def _item_values(item):
+    return {
+        'service_name': item.get('name'),
+        'unit': item.get('unit'),
+        'quantity': item.get('quantity') or 1,
+        'price_low': item.get('price_low'),
+        'price_high': item.get('price_high'),
+        'total_low': item.get('total_low') or 0,
+        'total_high': item.get('total_high') or 0,
+        'remark': item.get('remark') or '',
+    }
+
+
+def _backfill_items(conn, source_table, blob_column, item_table, fk_column):
+    """把 JSON 文字欄位拆成一列一個項目"""
+    rows = conn.execute(text(f"SELECT id, {blob_column} FROM {source_table}")).fetchall()
+    columns = ', '.join((fk_column,) + ITEM_COLUMNS)
+    params = ', '.join(':' + c for c in (fk_column,) + ITEM_COLUMNS)
+    insert = text(f"INSERT INTO {item_table} ({columns}) VALUES ({params})")
+    count = 0
+    for row_id, blob in rows:
+        try:
+            items = json.loads(blob or '[]')
+        except ValueError:
+            logger.warning(f"⚠️ 無法解析 {source_table}#{row_id} 的項目，略過")
+            continue
+        for item in items:
+            conn.execute(insert, {fk_column: row_id, **_item_values(item)})
+            count += 1
+    return count
+
+
+def migrate_0001_item_tables(conn, services):
+    # 既有資料表補上索引（新建立的資料庫由 create_all 建好，IF NOT EXISTS 可重複執行）
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_estimate_line_user_id ON estimate (line_user_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_estimate_created_at ON estimate (created_at)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_estimate_status ON estimate (status)"))
+    sessions = _backfill_items(conn, 'user_session', 'selected_items', 'session_item', 'session_id')
+    estimates = _backfill_items(conn, 'estimate', 'items', 'estimate_item', 'estimate_id')
+    logger.info(f"🗂️ 已轉移 {sessions} 筆會話項目、{estimates} 筆估價單項目")
+
+
+def _add_column(conn, table, column, ddl):
+    # create_all 建立的新資料表已有此欄位，只補舊資料表
+    columns = {c['name'] for c in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def migrate_0002_service_ids(conn, services):
+    update = {}
+    for table in ('session_item', 'estimate_item'):
+        _add_column(conn, table, 'service_id', 'INTEGER')
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_service_id ON {table} (service_id)"))
+        update[table] = text(f"UPDATE {table} SET service_id = :id WHERE service_name = :name AND service_id IS NULL")
+    # 依名稱回填目前服務目錄的 ID，已下架的項目保持 NULL
+    for service in services:
+        for statement in update.values():
+            conn.execute(statement, {'id': service['id'], 'name': service['name']})
+
+
+def migrate_0003_catalog_versions(conn, services):
+    _add_column(conn, 'user_session', 'catalog_version', 'VARCHAR(20)')
+    _add_column(conn, 'estimate', 'catalog_version', 'VARCHAR(20)')
+
+
+def migrate_0004_session_versions(conn, services):
+    # UserSession 的樂觀鎖版本，既有的會話從 1 開始
+    _add_column(conn, 'user_session', 'version', 'INTEGER NOT NULL DEFAULT 1')
+
+
+def migrate_0005_estimate_export_index(conn, services):
+    # 匯出以 (created_at, id) 做 keyset 分頁
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_estimate_created_at_id ON estimate (created_at, id)"))
+
+
+def migrate_0006_estimate_idempotency(conn, services):
+    # 表單的 idempotency key，唯一索引擋下同時送出的重複請求（NULL 不受限制）
+    _add_column(conn, 'estimate', 'idempotency_key', 'VARCHAR(64)')
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_estimate_idempotency_key ON estimate (idempotency_key)"
+    ))
+
+
+# 依序執行，已套用的步驟記錄在 schema_migrations
+MIGRATIONS = [
+    ('0001_item_tables', migrate_0001_item_tables),
+    ('0002_service_ids', migrate_0002_service_ids),
+    ('0003_catalog_versions', migrate_0003_catalog_versions),
+    ('0004_session_versions', migrate_0004_session_versions),
+    ('0005_estimate_export_index', migrate_0005_estimate_export_index),
+    ('0006_estimate_idempotency', migrate_0006_estimate_idempotency),
+]
+
+
+def run_migrations(db, services=()):
+    """執行尚未套用的遷移步驟（需在 db.create_all() 之後呼叫）
+
+    services 為目前的服務目錄，供需要依名稱回填 ID 的步驟使用。
+    """
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " name VARCHAR(100) PRIMARY KEY,"
+            " applied_at TIMESTAMP NOT NULL)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT name FROM schema_migrations"))}
+    for name, migrate in MIGRATIONS:
+        if name in applied:
+            continue
+        with db.engine.begin() as conn:
+            migrate(conn, services)
+            conn.execute(
+                text("INSERT INTO schema_migrations (name, applied_at) VALUES (:name, :applied_at)"),
+                {'name': name, 'applied_at': datetime.utcnow()}
+            )
@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# LINE 文字訊息上限 5000 字，一次推播最多 5 則訊息
+MAX_TEXT_LENGTH = 5000
+MAX_MESSAGES = 5
+DIGEST_SEPARATOR = "\n\n────────\n\n"
+
+
+def pack_digest(texts, max_length=MAX_TEXT_LENGTH, max_messages=MAX_MESSAGES):
+    """把多筆通知合併成最多 max_messages 則訊息，回傳 (訊息文字, 用掉的筆數)"""
+    if len(texts) == 1:
+        return [texts[0][:max_length]], 1
+    header = f"📬 共 {len(texts)} 筆新的估價申請"
+    messages = [header]
+    used = 0
+    for text in texts:
+        text = text[:max_length]
+        candidate = messages[-1] + DIGEST_SEPARATOR + text
+        if len(candidate) <= max_length:
+            messages[-1] = candidate
+        elif len(messages) < max_messages:
+            messages.append(text)
+        else:
+            break
+        used += 1
+    if used < len(texts):
+        messages[0] = messages[0].replace(header, f"📬 共 {used} 筆新的估價申請", 1)
+    return messages, used
+
+
+class NotificationDispatcher:
+    """背景推播通知給店家：短時間內的多筆通知合併成一則摘要，失敗時依退避時間重試
+
+    claim() 回傳 (batch_key, [(id, text), ...]) 或 None，
+    send(texts, batch_key) 實際推播，complete(ids, error) 記錄結果（error 為 None 代表成功）。
+    """
+
+    def __init__(self, claim, send, complete, interval=3.0):
+        self.claim = claim
+        self.send = send
+        self.complete = complete
+        self.interval = interval
+        self._thread = None
+        self.sent = 0
+        self.batches = 0
+        self.failures = 0
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+            self._thread.start()
+
+    def dispatch_once(self):
+        """送出一批到期的通知，回傳處理筆數"""
+        batch = self.claim()
+        if batch is None:
+            return 0
+        batch_key, rows = batch
+        ids = [row_id for row_id, _ in rows]
+        try:
+            self.send([text for _, text in rows], batch_key)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"❌ 推播失敗: {e}", extra={"batch_key": batch_key})
+            self.complete(ids, str(e))
+            return 0
+        self.complete(ids, None)
+        self.sent += len(ids)
+        self.batches += 1
+        logger.info(f"✅ 推播成功（{len(ids)} 筆）", extra={"batch_key": batch_key})
+        return len(ids)
+
+    def stats(self):
+        return {"sent": self.sent, "batches": self.batches, "failures": self.failures}
+
+    def _run(self):
+        while True:
+            # 每 interval 秒處理一次，期間累積的通知合併成一批
+            time.sleep(self.interval)
+            try:
+                while self.dispatch_once():
+                    pass
+            except Exception as e:
+                logger.exception(f"❌ 通知佇列處理失敗: {e}")
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(content):
+    """內容位址：正規化後 JSON 的 SHA-256，內容相同的估價單不論何時、由誰產生都對應同一個 key"""
+    canonical = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """產生好的估價單（Flex JSON、通知文字、列印用 HTML）依 (內容 key, 種類) 快取
+
+    記憶體層以 LRU 淘汰，總大小不超過 max_bytes；指定 path 時另有磁碟層，
+    記憶體被淘汰或程序重啟後仍可直接讀回，磁碟層超過 max_disk_bytes 時刪掉最久沒用到的檔案。
+    值必須能以 JSON 序列化，大小以序列化後的位元組數計算。
+    """
+
+    def __init__(self, max_bytes=8 * 1024 ** 2, path=None, max_disk_bytes=64 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self._items = OrderedDict()  # (key, kind) -> (值, 位元組數)
+        self._bytes = 0
+        self._disk_bytes = None  # 第一次寫入時才掃描目錄
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def get(self, key, kind, render):
+        """取得快取內容，記憶體與磁碟都沒有時呼叫 render() 產生並寫入兩層"""
+        with self._lock:
+            entry = self._items.get((key, kind))
+            if entry is not None:
+                self._items.move_to_end((key, kind))
+                self.hits += 1
+                return entry[0]
+        data = self._read(key, kind)
+        if data is not None:
+            value = json.loads(data)
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(key, kind, value, len(data))
+            return value
+        value = render()
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            self.misses += 1
+        self._remember(key, kind, value, len(data))
+        self._write(key, kind, data)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def expire(self, max_age):
+        """刪除磁碟層超過 max_age 秒沒用到的檔案，回傳刪除的檔案數與位元組數
+
+        檔案內含客戶的聯絡資料，不該比會話與估價單保留得更久。
+        """
+        if not self.path:
+            return {"files": 0, "bytes": 0}
+        cutoff = time.time() - max_age
+        files = removed = 0
+        for mtime, size, filename in self._scan()[0]:
+            if mtime >= cutoff:
+                continue
+            try:
+                os.remove(filename)
+            except OSError:
+                continue
+            files += 1
+            removed += size
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes = max(0, self._disk_bytes - removed)
+        return {"files": files, "bytes": removed}
+
+    def _remember(self, key, kind, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop((key, kind), None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._items[(key, kind)] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def _file(self, key, kind):
+        # 依 key 前兩碼分子目錄，避免單一目錄檔案過多
+        return os.path.join(self.path, key[:2], f"{key}.{kind}.json")
+
+    def _read(self, key, kind):
+        if not self.path:
+            return None
+        filename = self._file(key, kind)
+        try:
+            with open(filename, 'rb') as f:
+                data = f.read()
+            # 更新修改時間，磁碟層依此判斷最近使用
+            os.utime(filename)
+            return data
+        except OSError:
+            return None
+
+    def _write(self, key, kind, data):
+        if not self.path:
+            return
+        filename = self._file(key, kind)
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            # 先寫暫存檔再改名，其他程序不會讀到寫一半的內容
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp, filename)
+        except OSError as e:
+            logger.warning(f"⚠️ 無法寫入估價單快取：{e}")
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan()[1]
+            else:
+                self._disk_bytes += len(data)
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._prune()
+
+    def _scan(self):
+        files = []
+        total = 0
+        for directory, _, names in os.walk(self.path):
+            for name in names:
+                if not name.endswith('.json'):
+                    continue
+                filename = os.path.join(directory, name)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, filename))
+                total += stat.st_size
+        return files, total
+
+    def _prune(self):
+        """刪掉最久沒用到的檔案，直到磁碟層降到上限的 90%"""
+        files, total = self._scan()
+        files.sort()
+        target = self.max_disk_bytes * 0.9
+        for _, size, filename in files:
+            if total <= target:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
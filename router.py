@@ -0,0 +1,108 @@
+import re
+import threading
+import time
+
+
+class CommandRouter:
+    """文字指令與 postback 的分派表
+
+    - text：完全相符的固定指令，用 dict 查詢
+    - pattern：帶參數的指令，預先編譯的正規表示式
+    - action：postback data 以第一個「:」前的字串為 key
+    - step：依 (current_step, contact_step) 處理其餘文字輸入
+
+    每條路由都會記錄呼叫次數與耗時，方便找出熱點；
+    有提供 db_time（回傳目前執行緒累計 SQL 秒數的函式）時另外記錄其中花在資料庫的時間；
+    observe(路由名稱, 秒數) 供外部指標使用，profiler 提供 maybe_profile(路由名稱) 做抽樣分析。
+    """
+
+    def __init__(self, db_time=None, observe=None, profiler=None):
+        self.db_time = db_time
+        self.observe = observe
+        self.profiler = profiler
+        self.exact = {}
+        self.patterns = []
+        self.actions = {}
+        self.steps = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def text(self, *texts):
+        def decorator(func):
+            for text in texts:
+                self.exact[text] = func
+            return func
+        return decorator
+
+    def pattern(self, regex):
+        compiled = re.compile(regex)
+
+        def decorator(func):
+            self.patterns.append((compiled, func))
+            return func
+        return decorator
+
+    def action(self, key):
+        def decorator(func):
+            self.actions[key] = func
+            return func
+        return decorator
+
+    def step(self, current_step, contact_step=None):
+        def decorator(func):
+            self.steps[(current_step, contact_step)] = func
+            return func
+        return decorator
+
+    def route_text(self, event, session, text):
+        """依序比對固定指令、參數指令、對話狀態；都沒有對應時回傳 False"""
+        func = self.exact.get(text)
+        if func is not None:
+            return self._call(func, event, session)
+        for compiled, func in self.patterns:
+            match = compiled.match(text)
+            if match:
+                return self._call(func, event, session, match)
+        func = (self.steps.get((session.current_step, session.contact_step))
+                or self.steps.get((session.current_step, None)))
+        if func is not None:
+            return self._call(func, event, session, text)
+        return False
+
+    def route_postback(self, event, session, data):
+        key, _, arg = data.partition(':')
+        func = self.actions.get(key)
+        if func is None:
+            return False
+        return self._call(func, event, session, arg)
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    "count": count,
+                    "avg_ms": round(total / count * 1000, 2),
+                    "max_ms": round(peak * 1000, 2),
+                    "db_avg_ms": round(db_total / count * 1000, 2),
+                }
+                for name, (count, total, peak, db_total) in self._stats.items()
+            }
+
+    def _call(self, func, *args):
+        started = time.perf_counter()
+        db_started = self.db_time() if self.db_time else 0.0
+        try:
+            if self.profiler is not None:
+                with self.profiler.maybe_profile(func.__name__):
+                    func(*args)
+            else:
+                func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            db_elapsed = self.db_time() - db_started if self.db_time else 0.0
+            with self._lock:
+                count, total, peak, db_total = self._stats.get(func.__name__, (0, 0.0, 0.0, 0.0))
+                self._stats[func.__name__] = (count + 1, total + elapsed, max(peak, elapsed), db_total + db_elapsed)
+            if self.observe is not None:
+                self.observe(func.__name__, elapsed)
+        return True
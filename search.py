@@ -0,0 +1,89 @@
+import math
+import re
+import unicodedata
+
+# 名稱命中的權重遠高於備註：備註多半是「依現場施工難易度」之類的共用說明
+NAME_WEIGHT = 3
+REMARK_WEIGHT = 1
+# 關鍵字完整出現在名稱中時額外加分（乘上 n-gram 數）
+EXACT_BONUS = 2
+
+_IGNORED = re.compile(r'[\s\W_]+')
+
+
+def normalize(text):
+    """全形轉半形、英文轉小寫，去掉空白與標點，例如「２２０Ｖ 插座」→「220v插座」"""
+    return _IGNORED.sub('', unicodedata.normalize('NFKC', text or '').lower())
+
+
+def ngrams(text):
+    """單字與相鄰兩字的集合；中文沒有空白斷詞，bigram 足以區分「插座」「開關」這類詞"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class ServiceSearchIndex:
+    """服務名稱與備註的 n-gram 倒排索引，每個目錄版本建立一次
+
+    查詢時把關鍵字切成 bigram（只有一個字時用單字），依命中的欄位權重加總排序；
+    至少要命中一半的 bigram 才列入結果，避免只有一個常見字重疊的項目混進來。
+    """
+
+    def __init__(self, services):
+        self.services = list(services)
+        self._names = [normalize(service['name']) for service in self.services]
+        self._by_name = {}
+        for index, name in enumerate(self._names):
+            self._by_name.setdefault(name, index)
+        self._postings = {}  # gram -> {服務序號: 權重}
+        for index, service in enumerate(self.services):
+            for gram in ngrams(normalize(service.get('remark'))):
+                self._postings.setdefault(gram, {})[index] = REMARK_WEIGHT
+            for gram in ngrams(self._names[index]):
+                self._postings.setdefault(gram, {})[index] = NAME_WEIGHT
+
+    def search(self, query, limit=10):
+        """回傳最符合的服務項目（依分數、原本順序），沒有符合時回傳空 list"""
+        return [self.services[index] for index in self._rank(normalize(query))[:limit]]
+
+    def lookup(self, query, limit=5):
+        """把一行輸入對應到單一服務：確定時回傳 (服務, [])，否則回傳 (None, 最多 limit 個候選項目)
+
+        名稱完全相同、只有一個項目名稱包含關鍵字、或搜尋結果只有一個時視為確定。
+        """
+        query = normalize(query)
+        index = self._by_name.get(query)
+        if index is not None:
+            return self.services[index], []
+        ranked = self._rank(query)
+        containing = [index for index in ranked if query in self._names[index]]
+        if len(containing) == 1:
+            return self.services[containing[0]], []
+        if len(ranked) == 1:
+            return self.services[ranked[0]], []
+        return None, [self.services[index] for index in ranked[:limit]]
+
+    def _rank(self, query):
+        if not query:
+            return []
+        if len(query) == 1:
+            grams = {query}
+        else:
+            grams = {query[i:i + 2] for i in range(len(query) - 1)}
+        scores = {}
+        hits = {}
+        for gram in grams:
+            for index, weight in self._postings.get(gram, {}).items():
+                scores[index] = scores.get(index, 0) + weight
+                hits[index] = hits.get(index, 0) + 1
+        required = math.ceil(len(grams) / 2)
+        ranked = []
+        for index, score in scores.items():
+            if hits[index] < required:
+                continue
+            if query in self._names[index]:
+                score += EXACT_BONUS * len(grams)
+            ranked.append((-score, index))
+        ranked.sort()
+        return [index for _, index in ranked]
@@ -0,0 +1,252 @@
+import contextlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# 會寫回 UserSession 資料表的欄位
+SESSION_FIELDS = (
+    'current_step', 'selected_items', 'current_page', 'pending_item',
+    'contact_step', 'name', 'phone', 'address', 'visit_time', 'catalog_version',
+)
+
+
+class SessionConflict(Exception):
+    """會話在載入後已被其他程序更新，這次的變更必須捨棄並重新載入"""
+
+    def __init__(self, user_id):
+        super().__init__(f"會話 {user_id} 已被其他程序更新")
+        self.user_id = user_id
+
+
+class CachedSession:
+    """解碼後的會話狀態，selected_items 直接以 list 保存
+
+    對 SESSION_FIELDS 的任何賦值都會標記為 dirty，等待寫回資料庫。
+    version 是載入時的資料版本，寫回時用來偵測其他程序的更新。
+    """
+
+    def __init__(self, line_user_id, **fields):
+        object.__setattr__(self, 'line_user_id', line_user_id)
+        object.__setattr__(self, 'dirty', False)
+        object.__setattr__(self, 'last_access', time.monotonic())
+        object.__setattr__(self, 'current_step', fields.get('current_step') or 'start')
+        object.__setattr__(self, 'selected_items', fields.get('selected_items') or [])
+        object.__setattr__(self, 'current_page', fields.get('current_page') or 1)
+        object.__setattr__(self, 'pending_item', fields.get('pending_item'))
+        object.__setattr__(self, 'contact_step', fields.get('contact_step') or 0)
+        object.__setattr__(self, 'name', fields.get('name'))
+        object.__setattr__(self, 'phone', fields.get('phone'))
+        object.__setattr__(self, 'address', fields.get('address'))
+        object.__setattr__(self, 'visit_time', fields.get('visit_time'))
+        object.__setattr__(self, 'catalog_version', fields.get('catalog_version'))
+        object.__setattr__(self, 'version', fields.get('version'))
+
+    def __setattr__(self, key, value):
+        object.__setattr__(self, key, value)
+        if key in SESSION_FIELDS:
+            object.__setattr__(self, 'dirty', True)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in SESSION_FIELDS}
+
+
+class SessionCache:
+    """UserSession 的 LRU/TTL 寫回快取
+
+    load(user_id) 回傳欄位 dict（找不到時回傳 None），
+    store(sessions) 一次把多個 CachedSession 寫回資料庫。
+    flush_interval 秒定時批次寫回；設為 0 時每次 commit 都立即寫回。
+    多程序共用會話時傳入 validate(user_id)，回傳儲存端目前的版本，
+    每次 get 都會比對，版本不同就重新載入。
+
+    _lock 只保護記憶體中的 dict 與統計；load、validate、store 的 I/O 改在各使用者自己的鎖中進行，
+    一位使用者的慢查詢不會擋住其他使用者。定時寫回與淘汰遇到正在使用中的會話時略過，下次再處理。
+    """
+
+    def __init__(self, load, store, maxsize=1000, ttl=1800, flush_interval=5.0, validate=None):
+        self.load = load
+        self.store = store
+        self.validate = validate
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._user_locks = {}  # user_id -> [Lock, 使用中的數量]
+        self._timer = None
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.stale = 0
+
+    def get(self, user_id):
+        with self._user_lock(user_id):
+            with self._lock:
+                session = self._sessions.get(user_id)
+                # 閒置過久但還沒寫回的會話仍是最新狀態，照常使用
+                if session is not None and not session.dirty and time.monotonic() - session.last_access > self.ttl:
+                    del self._sessions[user_id]
+                    session = None
+            if session is not None and self.validate is not None and self.validate(user_id) != session.version:
+                # 其他程序已更新這個會話，本地副本作廢
+                with self._lock:
+                    self.stale += 1
+                self.discard(user_id)
+                session = None
+            if session is None:
+                session = CachedSession(user_id, **(self.load(user_id) or {}))
+                with self._lock:
+                    self.misses += 1
+                    self._sessions[user_id] = session
+                    overflow = list(self._sessions)[:max(0, len(self._sessions) - self.maxsize)]
+                for other in overflow:
+                    if other != user_id:
+                        self._evict(other)
+            else:
+                with self._lock:
+                    self.hits += 1
+                    if user_id in self._sessions:
+                        self._sessions.move_to_end(user_id)
+            object.__setattr__(session, 'last_access', time.monotonic())
+            return session
+
+    def commit(self, session, milestone=False):
+        """一輪對話的狀態變更結束；里程碑（如確認預約）或寫透模式時立即寫回"""
+        if milestone or self.flush_interval <= 0:
+            self.flush([session.line_user_id])
+
+    def flush(self, user_ids=None):
+        """把 dirty 的會話批次寫回資料庫，回傳寫回筆數
+
+        指定 user_ids 時會等這些使用者的鎖；定時寫回（未指定）則略過正在使用中的會話。
+        寫入前先清掉 dirty 旗標，寫入期間處理函式的新變更會重新標記，下次再寫回。
+        整批失敗時改為逐筆寫入，一筆壞資料不會擋住其他會話；仍失敗的會話保持 dirty，
+        全部處理完後丟出第一個例外。
+        """
+        with self._lock:
+            keys = list(self._sessions) if user_ids is None else list(user_ids)
+        with contextlib.ExitStack() as stack:
+            locked = []
+            for user_id in sorted(set(keys)):
+                if stack.enter_context(self._user_lock(user_id, blocking=user_ids is not None)):
+                    locked.append(user_id)
+            return self._write(locked)
+
+    def _write(self, user_ids):
+        """寫回這些使用者中 dirty 的會話；呼叫端須已持有它們的使用者鎖"""
+        with self._lock:
+            dirty = [self._sessions[k] for k in user_ids if k in self._sessions and self._sessions[k].dirty]
+            for session in dirty:
+                object.__setattr__(session, 'dirty', False)
+        if not dirty:
+            return 0
+        try:
+            self.store(dirty)
+            written, error = len(dirty), None
+        except Exception as e:
+            if len(dirty) == 1:
+                self._store_failed(dirty[0], e)
+                raise
+            logger.warning(f"⚠️ 會話批次寫回失敗，改為逐筆寫回：{e}")
+            written, error = 0, None
+            for session in dirty:
+                try:
+                    self.store([session])
+                    written += 1
+                except Exception as e:
+                    logger.error(f"❌ 會話 {session.line_user_id} 寫回失敗：{e}")
+                    self._store_failed(session, e)
+                    error = error or e
+        with self._lock:
+            self.flushes += 1
+        if error is not None:
+            raise error
+        return written
+
+    def _store_failed(self, session, error):
+        if self.validate is not None or isinstance(error, SessionConflict):
+            # 版本衝突（共用模式下的寫入失敗多半也是）時重試也不會成功，
+            # 丟掉本地副本，下次以儲存端的最新版本重新載入
+            self.discard(session.line_user_id)
+        else:
+            object.__setattr__(session, 'dirty', True)
+
+    def discard(self, user_id):
+        """丟掉本地副本（不寫回）"""
+        with self._lock:
+            self._sessions.pop(user_id, None)
+
+    def expire(self):
+        """清掉閒置超過 TTL 的會話（先寫回），正在使用中的會話略過"""
+        now = time.monotonic()
+        with self._lock:
+            stale = [k for k, s in self._sessions.items() if now - s.last_access > self.ttl]
+        return sum(1 for user_id in stale if self._evict(user_id, max_idle=self.ttl))
+
+    def start(self):
+        if self.flush_interval > 0 and self._timer is None:
+            self._timer = threading.Thread(target=self._run_timer, name="session-flush", daemon=True)
+            self._timer.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._sessions),
+                "dirty": sum(1 for s in self._sessions.values() if s.dirty),
+                "hits": self.hits,
+                "misses": self.misses,
+                "flushes": self.flushes,
+                "stale": self.stale,
+            }
+
+    @contextlib.contextmanager
+    def _user_lock(self, user_id, blocking=True):
+        """同一使用者的 I/O 依序進行；blocking=False 時拿不到鎖就 yield False"""
+        with self._lock:
+            entry = self._user_locks.setdefault(user_id, [threading.Lock(), 0])
+            entry[1] += 1
+        acquired = entry[0].acquire(blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                entry[0].release()
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._user_locks[user_id]
+
+    def _evict(self, user_id, max_idle=None):
+        """寫回後移出快取，成功時回傳 True；使用中、寫回失敗或期間又被使用的會話保留"""
+        with self._user_lock(user_id, blocking=False) as acquired:
+            if not acquired:
+                return False
+            with self._lock:
+                session = self._sessions.get(user_id)
+            if session is None:
+                return False
+            if session.dirty:
+                try:
+                    self._write([user_id])
+                except Exception as e:
+                    logger.error(f"❌ 會話 {user_id} 寫回失敗：{e}")
+                    return False
+            with self._lock:
+                if self._sessions.get(user_id) is not session or session.dirty:
+                    return False
+                if max_idle is not None and time.monotonic() - session.last_access <= max_idle:
+                    return False
+                del self._sessions[user_id]
+                return True
+
+    def _run_timer(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception(f"❌ 會話寫回失敗: {e}")
+            self.expire()
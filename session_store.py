@@ -0,0 +1,62 @@
+import json
+
+from session_cache import SESSION_FIELDS, SessionConflict  # noqa: F401  SessionConflict 由此匯出
+
+
+class RedisSessionStore:
+    """把會話存在 Redis（或相容的服務），供多個程序／主機共用
+
+    每位使用者一個 hash：data 為 SESSION_FIELDS 的 JSON，version 每次寫入加一；
+    寫入時以 WATCH 比對版本，版本不符就丟出 SessionConflict。
+    ttl 為 key 的保存秒數，每次寫入重新計算，應與資料庫模式的閒置會話保存期限一致。
+    """
+
+    def __init__(self, url, prefix='linebot:session:', ttl=86400):
+        # 只有 SESSION_STORE=redis 時才需要，延後 import 以免拖慢啟動
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SESSION_STORE=redis 需要安裝 redis 套件")
+        self._redis = redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def key(self, user_id):
+        return self.prefix + user_id
+
+    def load(self, user_id):
+        data, version = self.client.hmget(self.key(user_id), 'data', 'version')
+        if data is None:
+            return None
+        fields = json.loads(data)
+        fields['version'] = int(version)
+        return fields
+
+    def version(self, user_id):
+        version = self.client.hget(self.key(user_id), 'version')
+        return int(version) if version is not None else None
+
+    def store(self, sessions):
+        for session in sessions:
+            session_version = self._store_one(session)
+            object.__setattr__(session, 'version', session_version)
+
+    def _store_one(self, session):
+        key = self.key(session.line_user_id)
+        data = json.dumps({field: getattr(session, field) for field in SESSION_FIELDS}, ensure_ascii=False)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                current = pipe.hget(key, 'version')
+                current = int(current) if current is not None else None
+                if current != session.version:
+                    raise SessionConflict(session.line_user_id)
+                new_version = (current or 0) + 1
+                pipe.multi()
+                pipe.hset(key, mapping={'data': data, 'version': new_version})
+                pipe.expire(key, self.ttl)
+                pipe.execute()
+            except self._redis.WatchError:
+                raise SessionConflict(session.line_user_id)
+        return new_version